@@ -1,38 +1,68 @@
+import time
+_import_started = time.perf_counter()
+
 from flask import Flask, render_template, request
 from config import Config
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager
-from dotenv import load_dotenv
 import os
-from app.helpers import get_products_and_categories
+_import_seconds = time.perf_counter() - _import_started
 
 db = SQLAlchemy()
-migrate = Migrate()
 login = LoginManager()
+migrate = None
 
 def create_app():
+    from app.startup import StartupTimer
+
+    timer = StartupTimer()
+    timer.add('imports', _import_seconds)
     app = Flask(__name__)
-    load_dotenv()
     app.config.from_object(Config)
+    app.extensions['startup_timer'] = timer
+    timer.mark('config')
 
     db.init_app(app)
-    migrate.init_app(app, db)
+    from app.database import init_engine_events
+    init_engine_events(app)
+    # Flask-Migrate pulls in most of Alembic; web workers in lazy mode never
+    # run migrations, so they skip it
+    if not app.config['LAZY_STARTUP']:
+        init_migrations(app)
     login.init_app(app)
+    timer.mark('extensions')
 
     from app.routes.user import user_bp
     from app.routes.auth import auth_bp
     from app.routes.admin import admin_bp
+    from app.routes.api import api_bp
 
     app.register_blueprint(user_bp, url_prefix='/user')
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(admin_bp)
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+    timer.mark('blueprints')
+
+    from app.pagination import page_url
+    app.add_template_global(page_url)
+
+    from app.images import add_variant_cache_headers, image_srcset
+    app.add_template_global(image_srcset)
+    app.after_request(add_variant_cache_headers)
+
+    init_template_cache(app)
+    timer.mark('templates')
+
+    from app.commands import register_commands
+    register_commands(app)
+    timer.mark('commands')
 
     @app.route('/')
     def index():
+        from app.helpers import get_product_grid
         selected_category = request.args.get('category', '')
-        products, categories = get_products_and_categories(selected_category)
-        return render_template('shared/index.html', products=products, categories=categories, selected_category=selected_category)
+        product_grid, page, categories = get_product_grid(selected_category)
+        return render_template('shared/index.html', product_grid=product_grid, page=page, categories=categories, selected_category=selected_category)
 
     @app.errorhandler(404)
     def page_not_found(e):
@@ -40,29 +70,52 @@ def create_app():
 
     @login.user_loader
     def load_user(user_id):
-        from app.models import User
-        return User.query.get(int(user_id))
+        from app.user_cache import load_user as load_cached_user
+        return load_cached_user(int(user_id))
 
+    timer.mark('routes')
+    app.logger.info('Application started in %.0fms (%s)', timer.total * 1000, timer.summary())
     return app
 
+def init_migrations(app):
+    global migrate
+    from flask_migrate import Migrate
+    if migrate is None:
+        migrate = Migrate()
+    migrate.init_app(app, db)
+
+def init_template_cache(app):
+    # Compiled templates are cached on disk, so new workers skip parsing and
+    # compiling them; `flask compile-templates` fills the cache ahead of time.
+    cache_dir = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        from jinja2 import FileSystemBytecodeCache
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
 def init_admin_user():
-    app = create_app()
-    with app.app_context():
-        from app.models import User
-        admin_username = os.environ.get('ADMIN_USERNAME')
-        admin_email = os.environ.get('ADMIN_EMAIL')
-        admin_password = os.environ.get('ADMIN_PASSWORD')
-
-        if admin_username and admin_email and admin_password:
-            admin = User.query.filter_by(username=admin_username).first()
-            if not admin:
-                admin = User(
-                    username=admin_username,
-                    email=admin_email,
-                    is_admin=True
-                )
-                admin.set_password(admin_password)
-                db.session.add(admin)
-                db.session.commit()
-        else:
-            raise ValueError("Environment variables ADMIN_USERNAME, ADMIN_EMAIL, ADMIN_PASSWORD are not set.")
\ No newline at end of file
+    # `flask init-admin` calls this inside the CLI's app; only scripts
+    # without an app context pay for building one here.
+    from flask import has_app_context
+    if not has_app_context():
+        with create_app().app_context():
+            return init_admin_user()
+
+    from app.models import User
+    admin_username = os.environ.get('ADMIN_USERNAME')
+    admin_email = os.environ.get('ADMIN_EMAIL')
+    admin_password = os.environ.get('ADMIN_PASSWORD')
+
+    if admin_username and admin_email and admin_password:
+        admin = User.query.filter_by(username=admin_username).first()
+        if not admin:
+            admin = User(
+                username=admin_username,
+                email=admin_email,
+                is_admin=True
+            )
+            admin.set_password(admin_password)
+            db.session.add(admin)
+            db.session.commit()
+    else:
+        raise ValueError("Environment variables ADMIN_USERNAME, ADMIN_EMAIL, ADMIN_PASSWORD are not set.")
\ No newline at end of file
@@ -0,0 +1,31 @@
+from sqlalchemy import or_, select
+from app import db
+from app.models import User
+
+USERNAME_TAKEN = 'Username already taken. Please choose a different one.'
+EMAIL_TAKEN = 'Email address already registered. Please use a different one.'
+
+
+def find_user_conflicts(username, email, exclude_user_id=None):
+    # Resolves both unique columns with one OR query and returns
+    # {field: message} for the ones already taken. The unique constraints
+    # remain the real guard; see user_conflict_errors for the race path.
+    query = select(User.username, User.email).where(or_(User.username == username, User.email == email))
+    if exclude_user_id is not None:
+        query = query.where(User.user_id != exclude_user_id)
+
+    conflicts = {}
+    for existing_username, existing_email in db.session.execute(query.limit(2)):
+        if existing_username == username:
+            conflicts['username'] = USERNAME_TAKEN
+        if existing_email == email:
+            conflicts['email'] = EMAIL_TAKEN
+    return conflicts
+
+
+def user_conflict_errors(username, email, exclude_user_id=None):
+    # For an IntegrityError raised on commit after the pre-check passed: a
+    # concurrent request took the name or address in between. Call after
+    # rolling back.
+    return list(find_user_conflicts(username, email, exclude_user_id).values()) or \
+        ['Username or email address is already in use.']
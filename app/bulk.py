@@ -0,0 +1,135 @@
+import codecs
+import csv
+import io
+import json
+from collections import namedtuple
+from flask import current_app
+from sqlalchemy import insert, select, update
+from werkzeug.datastructures import MultiDict
+from app import db
+from app.models import Product
+
+PRODUCT_FIELDS = ('name', 'price', 'quantity', 'description', 'category')
+FORMATS = ('csv', 'jsonl')
+
+ImportReport = namedtuple('ImportReport', ['created', 'updated', 'errors'])
+
+
+def detect_format(filename, default='csv'):
+    extension = filename.rsplit('.', 1)[-1].lower() if filename and '.' in filename else ''
+    return {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}.get(extension, default)
+
+
+def iter_rows(stream, fmt):
+    # Yields (line_number, row, error) without reading the whole file into memory.
+    reader = codecs.getreader('utf-8-sig')(stream)
+    if fmt == 'csv':
+        rows = csv.DictReader(reader)
+        for row in rows:
+            yield rows.line_num, row, None
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(reader, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Each line must be a JSON object.'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def validate_row(row):
+    # Applies exactly the ProductForm rules used by admin.add_product.
+    from forms import ProductForm
+
+    formdata = MultiDict({field: '' if row.get(field) is None else str(row.get(field)) for field in PRODUCT_FIELDS})
+    form = ProductForm(formdata=formdata, meta={'csrf': False})
+    if not form.validate():
+        return None, '; '.join(f'{field}: {", ".join(messages)}' for field, messages in form.errors.items())
+    return {
+        'name': form.name.data.strip(),
+        'price': form.price.data,
+        'quantity': form.quantity.data,
+        'description': form.description.data or None,
+        'category': form.category.data.strip(),
+    }, None
+
+
+def import_products(stream, fmt, batch_size=None):
+    batch_size = batch_size or current_app.config['BULK_IMPORT_BATCH_SIZE']
+    created = updated = 0
+    errors = []
+    batch = {}
+
+    for line_number, row, error in iter_rows(stream, fmt):
+        if error is None:
+            values, error = validate_row(row)
+        if error is not None:
+            errors.append((line_number, error))
+            continue
+        # A name repeated within a batch keeps its last row
+        batch[values['name']] = (line_number, values)
+        if len(batch) >= batch_size:
+            batch_created, batch_updated = _upsert_batch(batch, errors)
+            created += batch_created
+            updated += batch_updated
+            batch = {}
+
+    if batch:
+        batch_created, batch_updated = _upsert_batch(batch, errors)
+        created += batch_created
+        updated += batch_updated
+    return ImportReport(created, updated, errors)
+
+
+def _upsert_batch(batch, errors):
+    try:
+        existing = dict(db.session.execute(
+            select(Product.name, Product.id).where(Product.name.in_(list(batch)))
+        ).all())
+        new_rows = [values for name, (_, values) in batch.items() if name not in existing]
+        changed_rows = [dict(values, id=existing[name]) for name, (_, values) in batch.items() if name in existing]
+        if new_rows:
+            db.session.execute(insert(Product), new_rows)
+        if changed_rows:
+            db.session.execute(update(Product), changed_rows)
+        db.session.commit()
+        return len(new_rows), len(changed_rows)
+    except Exception as e:
+        db.session.rollback()
+        errors.extend((line_number, f'Batch failed: {e}') for line_number, _ in batch.values())
+        return 0, 0
+
+
+def export_products(fmt):
+    # Generator of text chunks; rows are fetched with yield_per so the
+    # export never holds the full catalog in memory.
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+    result = db.session.execute(
+        select(*(getattr(Product, field) for field in PRODUCT_FIELDS))
+        .order_by(Product.id)
+        .execution_options(yield_per=1000)
+    )
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(PRODUCT_FIELDS)
+        for partition in result.partitions():
+            writer.writerows(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for partition in result.partitions():
+            # Prices are Decimal; keep them exact as strings
+            yield ''.join(json.dumps(dict(zip(PRODUCT_FIELDS, row)), default=str) + '\n' for row in partition)
@@ -0,0 +1,105 @@
+from collections import namedtuple
+from decimal import Decimal
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import Cart, Discount, Product
+from app.money import ZERO, to_money
+from app.pricing import apply_discount
+
+LOYALTY_DISCOUNT = Decimal('0.15')
+
+CartLine = namedtuple('CartLine', ['cart_id', 'product_id', 'name', 'quantity', 'price', 'discounted_price', 'line_total'])
+CartSummary = namedtuple('CartSummary', ['lines', 'subtotal', 'loyalty_discount', 'discount_amount', 'total'])
+
+
+class CartError(Exception):
+    pass
+
+
+def get_cart_summary(user):
+    # Lines, product names and discounts come from a single joined query;
+    # loyalty eligibility is read from the user's materialized stats.
+    rows = db.session.execute(
+        select(Cart.cart_id, Cart.product_id, Product.name, Cart.quantity, Product.price,
+               db.func.max(Discount.discount_percentage))
+        .join(Product, Product.id == Cart.product_id)
+        .outerjoin(Discount, Discount.product_id == Product.id)
+        .where(Cart.user_id == user.user_id)
+        .group_by(Cart.cart_id, Cart.product_id, Product.name, Cart.quantity, Product.price)
+        .order_by(Cart.cart_id)
+    )
+
+    lines = []
+    for cart_id, product_id, name, quantity, price, discount_percentage in rows:
+        discounted_price = apply_discount(price, discount_percentage)
+        lines.append(CartLine(cart_id, product_id, name, quantity, price, discounted_price, discounted_price * quantity))
+
+    subtotal = sum((line.line_total for line in lines), ZERO)
+    loyalty_discount = LOYALTY_DISCOUNT if lines and user.is_eligible_for_discount() else ZERO
+    discount_amount = to_money(subtotal * loyalty_discount)
+    return CartSummary(lines, subtotal, loyalty_discount, discount_amount, subtotal - discount_amount)
+
+
+def reserve_stock(product_id, quantity):
+    # Conditional decrement: the row is only touched if enough stock is left,
+    # so concurrent shoppers can never drive the quantity below zero.
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.quantity >= quantity)
+        .values(quantity=Product.quantity - quantity)
+    )
+    return result.rowcount == 1
+
+
+def release_stock(product_id, quantity):
+    db.session.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(quantity=Product.quantity + quantity)
+    )
+
+
+def add_to_cart(user_id, product_id, quantity):
+    for attempt in range(2):
+        try:
+            if not reserve_stock(product_id, quantity):
+                raise CartError('Item not available in the requested quantity.')
+
+            cart_item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
+            if cart_item:
+                cart_item.quantity = Cart.quantity + quantity
+            else:
+                db.session.add(Cart(user_id=user_id, product_id=product_id, quantity=quantity))
+            db.session.commit()
+            return
+        except IntegrityError:
+            # A concurrent request inserted the same cart line first; the
+            # rollback also released our reservation, so retry as an update.
+            db.session.rollback()
+            if attempt:
+                raise
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+def remove_from_cart(user_id, product_id, quantity=None):
+    # Removes `quantity` units (all of them when None) and returns the
+    # reserved stock to the product. Returns False if the item is not in the cart.
+    try:
+        cart_item = Cart.query.filter_by(user_id=user_id, product_id=product_id).first()
+        if not cart_item:
+            return False
+
+        if quantity is None or quantity >= cart_item.quantity:
+            quantity = cart_item.quantity
+            db.session.delete(cart_item)
+        else:
+            cart_item.quantity = Cart.quantity - quantity
+        release_stock(product_id, quantity)
+        db.session.commit()
+        return True
+    except Exception:
+        db.session.rollback()
+        raise
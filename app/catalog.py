@@ -0,0 +1,94 @@
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from flask import current_app
+from app.fragments import clear_fragments
+
+CatalogProduct = namedtuple('CatalogProduct', [
+    'id', 'name', 'price', 'discounted_price', 'quantity', 'description', 'category', 'image_path', 'image_variants'
+])
+
+CatalogSnapshot = namedtuple('CatalogSnapshot', [
+    'version', 'built_at', 'products', 'categories', 'search_index', 'etag', 'last_modified'
+])
+
+_lock = threading.Lock()
+_version = 0
+_snapshot = None
+_invalidated_at = float('-inf')
+
+
+def invalidate_catalog():
+    # Called after every commit that changes products, stock or discounts.
+    global _version, _invalidated_at
+    with _lock:
+        _version += 1
+        _invalidated_at = time.monotonic()
+    clear_fragments()
+
+
+def get_catalog():
+    global _snapshot
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        return snapshot
+
+    with _lock:
+        if not _is_fresh(_snapshot):
+            _snapshot = _build_catalog(_version, _snapshot)
+        return _snapshot
+
+
+def _is_fresh(snapshot):
+    if snapshot is None or snapshot.version != _version:
+        return False
+    # Other worker processes cannot invalidate our copy, so bound how stale it may get.
+    ttl = current_app.config.get('CATALOG_CACHE_TTL', 60)
+    return time.monotonic() - snapshot.built_at < ttl
+
+
+def _build_catalog(version, previous=None):
+    from app.models import Product, ProductImageVariant
+    from app.images import ImageVariant
+    from app.pricing import get_prices
+    from app.search import SearchIndex
+    from app.database import read_session
+
+    # Right after a local write the replicas may not have caught up yet, and
+    # a stale rebuild would otherwise be served until the TTL runs out.
+    session = read_session(stale_ok=time.monotonic() - _invalidated_at >= current_app.config['REPLICA_LAG_SECONDS'])
+    rows = session.query(Product).order_by(Product.id).all()
+    prices = get_prices(session=session)
+    variants = {}
+    for variant in session.query(ProductImageVariant).order_by(ProductImageVariant.product_id,
+                                                               ProductImageVariant.width):
+        variants.setdefault(variant.product_id, []).append(
+            ImageVariant(variant.path, variant.format, variant.width, variant.height))
+    products = tuple(
+        CatalogProduct(
+            id=product.id,
+            name=product.name,
+            price=product.price,
+            discounted_price=prices[product.id].discounted_price if product.id in prices else product.price,
+            quantity=product.quantity,
+            description=product.description,
+            category=product.category,
+            image_path=product.image_path,
+            image_variants=tuple(variants.get(product.id, ())),
+        )
+        for product in rows
+    )
+    categories = sorted({product.category for product in products})
+
+    # The ETag is a digest of the content, so every worker process derives
+    # the same value for the same catalog and HTTP caches can share it.
+    etag = hashlib.sha1(repr(products).encode()).hexdigest()
+    if previous is not None and previous.etag == etag:
+        last_modified = previous.last_modified
+    else:
+        last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+    return CatalogSnapshot(version=version, built_at=time.monotonic(), products=products, categories=categories,
+                           search_index=SearchIndex(products), etag=etag, last_modified=last_modified)
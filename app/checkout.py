@@ -0,0 +1,49 @@
+from sqlalchemy import delete, insert, select
+from app import db
+from app.models import User, Cart, Order, OrderItem
+from app.cart import get_cart_summary
+from app.ledger import PURCHASE, LedgerError, record_transaction
+
+
+class CheckoutError(Exception):
+    pass
+
+
+def place_order(user):
+    # Order, order items and the ledger debit are written in one transaction.
+    # Stock was already reserved when the items were added to the cart.
+    try:
+        # Lock the user's cart lines before reading them, so a concurrent
+        # add_to_cart cannot grow a line between the read and the DELETE
+        # below. The summary query itself groups rows, which PostgreSQL
+        # does not allow together with FOR UPDATE.
+        db.session.execute(select(Cart.cart_id).where(Cart.user_id == user.user_id).with_for_update()).all()
+        summary = get_cart_summary(user)
+        if not summary.lines:
+            raise CheckoutError('Your cart is empty. Add items to your cart before checking out.')
+        total = summary.total
+
+        order = Order(user_id=user.user_id, total=total)
+        db.session.add(order)
+        db.session.flush()
+        order_id = order.order_id
+        try:
+            record_transaction(user.user_id, -total, PURCHASE, order_id=order_id, extra_values={
+                'order_count': User.order_count + 1,
+                'total_spent': User.total_spent + total,
+            })
+        except LedgerError:
+            raise CheckoutError('Insufficient balance.')
+        db.session.execute(insert(OrderItem), [
+            {'order_id': order_id, 'product_id': line.product_id, 'quantity': line.quantity,
+             'price': line.discounted_price}
+            for line in summary.lines
+        ])
+        db.session.execute(
+            delete(Cart).where(Cart.user_id == user.user_id, Cart.cart_id.in_([line.cart_id for line in summary.lines]))
+        )
+        db.session.commit()
+        return order_id
+    except Exception:
+        db.session.rollback()
+        raise
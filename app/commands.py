@@ -0,0 +1,178 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select, text, update
+from app import db
+
+
+def register_commands(app):
+    app.cli.add_command(backfill_loyalty_stats)
+    app.cli.add_command(generate_image_variants)
+    app.cli.add_command(import_products)
+    app.cli.add_command(export_products)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(verify_balances)
+    app.cli.add_command(compile_templates)
+    app.cli.add_command(init_admin)
+    app.cli.add_command(startup_timings)
+
+
+@click.command('backfill-loyalty-stats')
+@with_appcontext
+def backfill_loyalty_stats():
+    """Recompute Users.order_count and Users.total_spent from Orders."""
+    from app.models import User, Order
+
+    order_count = select(func.count(Order.order_id)).where(Order.user_id == User.user_id).scalar_subquery()
+    total_spent = select(func.coalesce(func.sum(Order.total), 0)).where(Order.user_id == User.user_id).scalar_subquery()
+    result = db.session.execute(
+        update(User).values(order_count=order_count, total_spent=total_spent),
+        execution_options={'synchronize_session': False},
+    )
+    db.session.commit()
+    click.echo(f'Updated loyalty stats for {result.rowcount} users.')
+
+
+@click.command('generate-image-variants')
+@click.option('--product-id', type=int, help='Only process this product.')
+@with_appcontext
+def generate_image_variants(product_id):
+    """Generate resized WebP/JPEG variants for product images."""
+    from app.models import Product
+    from app.images import generate_variants
+
+    query = db.session.query(Product.id, Product.name, Product.image_path).order_by(Product.id)
+    if product_id is not None:
+        query = query.filter(Product.id == product_id)
+
+    for product_id, name, image_path in query.all():
+        try:
+            variants = generate_variants(product_id, image_path)
+            if variants is None:
+                click.echo(f'{name}: skipped (image changed)')
+            else:
+                click.echo(f'{name}: {len(variants)} variants')
+        except Exception as e:
+            click.echo(f'{name}: failed ({e})', err=True)
+
+
+@click.command('import-products')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@with_appcontext
+def import_products(path, fmt):
+    """Upsert products from a CSV or JSONL file, keyed on name."""
+    from app.bulk import detect_format, import_products as run_import
+
+    with open(path, 'rb') as f:
+        report = run_import(f, fmt or detect_format(path))
+    for line_number, error in report.errors:
+        click.echo(f'line {line_number}: {error}', err=True)
+    click.echo(f'{report.created} created, {report.updated} updated, {len(report.errors)} errors.')
+
+
+@click.command('export-products')
+@click.argument('output', type=click.File('w'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='csv')
+@with_appcontext
+def export_products(output, fmt):
+    """Stream all products as CSV or JSONL."""
+    from app.bulk import export_products as run_export
+
+    for chunk in run_export(fmt):
+        output.write(chunk)
+
+
+def hot_queries():
+    # (label, table, statement) for the lookups behind cart, checkout, order
+    # history, pricing and category browsing. Each must be served by an index.
+    from app.models import Cart, Discount, Order, OrderItem, Product
+
+    return [
+        ('cart lines', 'Cart', select(Cart).where(Cart.user_id == 1)),
+        ('cart line', 'Cart', select(Cart).where(Cart.user_id == 1, Cart.product_id == 1)),
+        ('order history', 'Orders', select(Order).where(Order.user_id == 1)
+            .order_by(Order.order_date.desc(), Order.order_id.desc()).limit(21)),
+        ('order lines', 'OrderItems', select(OrderItem).where(OrderItem.order_id.in_([1, 2]))),
+        ('product discount', 'Discounts', select(Discount).where(Discount.product_id == 1)),
+        ('category filter', 'Products', select(Product).where(Product.category == 'Fruits')),
+    ]
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans():
+    """Show query plans for the hot queries; on SQLite, fail on table scans."""
+    dialect = db.engine.dialect
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+    failures = 0
+    for label, table, statement in hot_queries():
+        sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+        plan = [row[-1] for row in db.session.execute(text(prefix + sql))]
+        # SQLite reports a full scan as "SCAN <table>" without a USING clause
+        scans = [detail for detail in plan
+                 if dialect.name == 'sqlite' and detail.startswith('SCAN') and table in detail and 'USING' not in detail]
+        failures += bool(scans)
+        click.echo(f'{"FAIL" if scans else "ok  "} {label}')
+        for detail in plan:
+            click.echo(f'       {detail}')
+    if failures:
+        click.echo(f'{failures} hot queries scan a table; run `flask db upgrade`.', err=True)
+        raise SystemExit(1)
+
+
+@click.command('verify-balances')
+@click.option('--fix', is_flag=True, help='Reset mismatched cached balances to the ledger total.')
+@with_appcontext
+def verify_balances(fix):
+    """Compare Users.balance with the sum of each user's ledger entries."""
+    from app.ledger import find_balance_mismatches, rebuild_balances
+
+    mismatches = find_balance_mismatches()
+    for user_id, username, balance, ledger_balance in mismatches:
+        click.echo(f'{username} (#{user_id}): balance {balance}, ledger {ledger_balance}')
+    if not mismatches:
+        click.echo('All balances match the ledger.')
+    elif fix:
+        click.echo(f'Rebuilt {rebuild_balances([row.user_id for row in mismatches])} balances from the ledger.')
+    else:
+        raise SystemExit(1)
+
+
+@click.command('compile-templates')
+@with_appcontext
+def compile_templates():
+    """Compile every template into the Jinja bytecode cache."""
+    from flask import current_app
+
+    env = current_app.jinja_env
+    if env.bytecode_cache is None:
+        raise click.ClickException('JINJA_BYTECODE_CACHE_DIR is not set.')
+    names = [name for name in env.list_templates() if name.endswith('.html')]
+    for name in names:
+        env.get_template(name)
+    click.echo(f'Compiled {len(names)} templates into {current_app.config["JINJA_BYTECODE_CACHE_DIR"]}.')
+
+
+@click.command('init-admin')
+@with_appcontext
+def init_admin():
+    """Create the admin user from ADMIN_USERNAME, ADMIN_EMAIL and ADMIN_PASSWORD."""
+    from app import init_admin_user
+
+    try:
+        init_admin_user()
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo('Admin user is set up.')
+
+
+@click.command('startup-timings')
+@with_appcontext
+def startup_timings():
+    """Show how long each phase of create_app took for this process."""
+    from flask import current_app
+
+    timer = current_app.extensions['startup_timer']
+    for phase, seconds in timer.phases:
+        click.echo(f'{phase:<12} {seconds * 1000:8.1f} ms')
+    click.echo(f'{"total":<12} {timer.total * 1000:8.1f} ms')
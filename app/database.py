@@ -0,0 +1,69 @@
+import random
+import time
+from flask import current_app, g, has_request_context, request, session
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import db
+
+REPLICA_BIND_PREFIX = 'replica'
+PRIMARY_UNTIL_KEY = '_read_primary_until'
+
+
+def configure_sqlite(dbapi_connection, config):
+    # WAL lets readers run alongside the single writer, NORMAL sync is
+    # durable enough in WAL mode, and the busy timeout makes writers queue
+    # for the lock instead of failing immediately with "database is locked".
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f'PRAGMA busy_timeout = {int(config["SQLITE_BUSY_TIMEOUT_MS"])}')
+        cursor.execute(f'PRAGMA journal_mode = {config["SQLITE_JOURNAL_MODE"]}')
+        cursor.execute(f'PRAGMA synchronous = {config["SQLITE_SYNCHRONOUS"]}')
+    finally:
+        cursor.close()
+
+
+def init_engine_events(app):
+    with app.app_context():
+        engines = set(db.engines.values())
+    config = app.config
+    for engine in engines:
+        if engine.dialect.name == 'sqlite':
+            event.listen(engine, 'connect', lambda dbapi_connection, _: configure_sqlite(dbapi_connection, config))
+
+    app.after_request(stick_to_primary_after_write)
+    app.teardown_appcontext(close_read_session)
+
+
+def replica_engines():
+    return [engine for key, engine in db.engines.items() if key and key.startswith(REPLICA_BIND_PREFIX)]
+
+
+def read_session(stale_ok=True):
+    # Session for read-only work. With replicas configured it is bound to one
+    # of them (picked once per app context); otherwise, or when the caller
+    # cannot tolerate replication lag, it is the primary db.session.
+    engines = replica_engines()
+    if not engines or not stale_ok or _client_wrote_recently():
+        return db.session
+    if 'read_session' not in g:
+        g.read_session = Session(bind=random.choice(engines))
+    return g.read_session
+
+
+def close_read_session(exception=None):
+    read = g.pop('read_session', None)
+    if read is not None:
+        read.close()
+
+
+def _client_wrote_recently():
+    return has_request_context() and session.get(PRIMARY_UNTIL_KEY, 0) > time.time()
+
+
+def stick_to_primary_after_write(response):
+    # A client that just wrote reads from the primary for a short while, so
+    # redirects after a write (checkout -> order history, admin edit ->
+    # listing) see their own changes despite replication lag.
+    if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_engines():
+        session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config['REPLICA_LAG_SECONDS']
+    return response
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from flask import current_app, render_template
+from markupsafe import Markup
+
+
+class FragmentCache:
+    # LRU of rendered HTML fragments, bounded by the total UTF-8 size of the
+    # cached strings rather than by entry count.
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, html):
+        size = len(html.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous[1]
+            self._entries[key] = (html, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fragment_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FragmentCache(current_app.config['FRAGMENT_CACHE_MAX_BYTES'])
+    return _cache
+
+
+def clear_fragments():
+    if _cache is not None:
+        _cache.clear()
+
+
+def render_cached(key, template, **context):
+    cache = get_fragment_cache()
+    html = cache.get(key)
+    if html is None:
+        html = Markup(render_template(template, **context))
+        cache.set(key, html)
+    return html
@@ -1,21 +1,30 @@
-def get_products_and_categories(selected_category='', search_query=''):
-    from app.models import Product
-    from app import db
-    
-    categories = db.session.query(Product.category).distinct().all()
-    categories = [c[0] for c in categories]
-    
-    query = Product.query
-    
-    if selected_category:
-        query = query.filter_by(category=selected_category)
-    
+def get_products_and_categories(selected_category='', search_query='', catalog=None):
+    from app.catalog import get_catalog
+
+    catalog = catalog or get_catalog()
     if search_query:
-        query = query.filter(Product.name.ilike(f'%{search_query}%'))
-    
-    products = query.all()
-    
-    for product in products:
-        product.discounted_price = product.get_discounted_price()
-    
-    return products, categories
+        products = catalog.search_index.search(search_query)
+    else:
+        products = catalog.products
+
+    if selected_category:
+        products = [product for product in products if product.category == selected_category]
+
+    return list(products), list(catalog.categories)
+
+
+def get_product_grid(selected_category='', search_query=''):
+    # The rendered grid only depends on the catalog content and the listing
+    # arguments, so it is cached under the ETag of the snapshot it was
+    # rendered from.
+    from app.catalog import get_catalog
+    from app.fragments import render_cached
+    from app.pagination import get_page_args, paginate_list
+
+    catalog = get_catalog()
+    page_args = get_page_args()
+    products, categories = get_products_and_categories(selected_category, search_query, catalog=catalog)
+    page = paginate_list(products, *page_args, ordered=not search_query)
+    key = ('product_grid', catalog.etag, selected_category, search_query) + page_args
+    product_grid = render_cached(key, 'shared/product_grid.html', products=page.items)
+    return product_grid, page, categories
@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, request, url_for
+from sqlalchemy import delete, insert, select
+from app import db
+from app.models import Product, ProductImageVariant
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_IMAGE = 'assets/images/product_images/Placeholder.jpg'
+VARIANTS_DIR = 'assets/images/product_images/variants'
+UPLOADS_DIR = 'assets/images/product_images/uploads'
+UPLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_SIGNATURES = {
+    'jpg': (b'\xff\xd8\xff',),
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'webp': (b'RIFF',),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 6}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+ImageVariant = namedtuple('ImageVariant', ['path', 'format', 'width', 'height'])
+
+
+class ImageUploadError(Exception):
+    pass
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def generate_variants(product_id, image_path):
+    # Writes resized WebP and JPEG copies of a product image under
+    # VARIANTS_DIR and replaces the product's ProductImageVariants rows.
+    # File names carry a digest of the source, so they never change
+    # content and can be cached forever. Returns None without touching the
+    # rows if the product's image changed while the variants were rendered.
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        raise RuntimeError('Pillow is required to generate image variants.')
+
+    source_path = image_path or PLACEHOLDER_IMAGE
+    source = os.path.join(current_app.static_folder, source_path)
+    digest = file_digest(source)[:12]
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    target_dir = os.path.join(current_app.static_folder, VARIANTS_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+
+    variants = []
+    created = []
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        widths = sorted({min(width, image.width) for width in current_app.config['IMAGE_VARIANT_WIDTHS']})
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for variant_format, (pil_format, extension, options) in VARIANT_FORMATS.items():
+                filename = f'{stem}.{digest}.w{width}.{extension}'
+                target = os.path.join(target_dir, filename)
+                if not os.path.exists(target):
+                    temporary = f'{target}.{os.getpid()}.tmp'
+                    resized.save(temporary, pil_format, **options)
+                    os.replace(temporary, target)
+                    created.append(target)
+                variants.append(ImageVariant(f'{VARIANTS_DIR}/{filename}', variant_format, width, height))
+
+    try:
+        # The delete takes SQLite's write lock and FOR UPDATE locks the
+        # product row elsewhere, so a new upload cannot land before commit.
+        db.session.execute(delete(ProductImageVariant).where(ProductImageVariant.product_id == product_id))
+        current = db.session.execute(
+            select(Product.image_path).where(Product.id == product_id).with_for_update()).first()
+        if current is None or current.image_path != image_path:
+            db.session.rollback()
+            for target in created:
+                os.remove(target)
+            return None
+        db.session.execute(insert(ProductImageVariant), [
+            dict(product_id=product_id, **variant._asdict()) for variant in variants
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return variants
+
+
+def image_srcset(variants, variant_format):
+    return ', '.join(
+        f"{url_for('static', filename=variant.path)} {variant.width}w"
+        for variant in variants if variant.format == variant_format
+    )
+
+
+def add_variant_cache_headers(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304):
+        filename = (request.view_args or {}).get('filename', '')
+        if filename.startswith(VARIANTS_DIR + '/'):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def _detect_image_type(header):
+    for extension, signatures in IMAGE_SIGNATURES.items():
+        if any(header.startswith(signature) for signature in signatures):
+            if extension == 'webp' and header[8:12] != b'WEBP':
+                continue
+            return extension
+    return None
+
+
+def save_upload(file_storage):
+    # Streams the upload to disk in chunks while hashing it, then stores it
+    # under its content hash so re-uploading the same file reuses one copy.
+    # Returns the static-relative path.
+    max_bytes = current_app.config['MAX_IMAGE_UPLOAD_BYTES']
+    target_dir = os.path.join(current_app.static_folder, UPLOADS_DIR)
+    os.makedirs(target_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    header = b''
+    fd, temporary = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in iter(lambda: file_storage.stream.read(UPLOAD_CHUNK_SIZE), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageUploadError(f'Image is larger than {max_bytes // (1024 * 1024)} MB.')
+                if len(header) < 12:
+                    header += chunk[:12 - len(header)]
+                digest.update(chunk)
+                out.write(chunk)
+
+        extension = _detect_image_type(header)
+        if size == 0 or extension is None:
+            raise ImageUploadError('Only JPEG, PNG and WebP images can be uploaded.')
+
+        filename = f'{digest.hexdigest()[:32]}.{extension}'
+        target = os.path.join(target_dir, filename)
+        if os.path.exists(target):
+            os.remove(temporary)
+        else:
+            os.replace(temporary, target)
+        return f'{UPLOADS_DIR}/{filename}'
+    except Exception:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def set_product_image(product, image_path):
+    # Old variants are dropped with the path change so the storefront falls
+    # back to the new original until the background job has finished.
+    try:
+        product.image_path = image_path
+        db.session.execute(delete(ProductImageVariant).where(ProductImageVariant.product_id == product.id))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def submit_variant_generation(product_id, image_path):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=current_app.config['IMAGE_WORKERS'],
+                                           thread_name_prefix='image-variants')
+    flask_app = current_app._get_current_object()
+    return _executor.submit(_generate_variants_job, flask_app, product_id, image_path)
+
+
+def _generate_variants_job(flask_app, product_id, image_path):
+    from app.catalog import invalidate_catalog
+
+    with flask_app.app_context():
+        try:
+            product = db.session.get(Product, product_id)
+            if product is None or product.image_path != image_path:
+                return
+            if generate_variants(product_id, image_path) is None:
+                logger.info('Image of product %s changed, skipping its old variants', product_id)
+                return
+            invalidate_catalog()
+        except Exception:
+            logger.exception('Generating image variants for product %s failed', product_id)
@@ -0,0 +1,145 @@
+from sqlalchemy import bindparam, select, update
+from app import db
+from app.models import Product
+
+
+class StockUpdateError(Exception):
+    def __init__(self, message, details):
+        super().__init__(message)
+        self.details = details
+
+
+class UnknownProductError(StockUpdateError):
+    pass
+
+
+class StockConflictError(StockUpdateError):
+    pass
+
+
+def parse_stock_updates(updates):
+    # Normalizes [{id|name, delta|quantity[, expected_quantity]}, ...] and
+    # returns (deltas, absolutes) keyed by ('id', value) or ('name', value).
+    # Deltas for the same product are summed.
+    if not isinstance(updates, list) or not updates:
+        raise StockUpdateError('updates must be a non-empty list.', [])
+
+    errors = []
+    deltas = {}
+    absolutes = {}
+    for index, entry in enumerate(updates):
+        if not isinstance(entry, dict):
+            errors.append({'index': index, 'error': 'Each update must be an object.'})
+            continue
+        if isinstance(entry.get('id'), int):
+            ref = ('id', entry['id'])
+        elif isinstance(entry.get('name'), str) and entry['name']:
+            ref = ('name', entry['name'])
+        else:
+            errors.append({'index': index, 'error': 'id (integer) or name is required.'})
+            continue
+
+        delta, quantity, expected = entry.get('delta'), entry.get('quantity'), entry.get('expected_quantity')
+        if (delta is None) == (quantity is None):
+            errors.append({'index': index, 'error': 'Exactly one of delta or quantity is required.'})
+        elif delta is not None and not isinstance(delta, int):
+            errors.append({'index': index, 'error': 'delta must be an integer.'})
+        elif quantity is not None and (not isinstance(quantity, int) or quantity < 0):
+            errors.append({'index': index, 'error': 'quantity must be a non-negative integer.'})
+        elif expected is not None and (quantity is None or not isinstance(expected, int)):
+            errors.append({'index': index, 'error': 'expected_quantity must be an integer and requires quantity.'})
+        elif ref in absolutes or (quantity is not None and ref in deltas):
+            errors.append({'index': index, 'error': 'An absolute quantity cannot be combined with other updates for the same product.'})
+        elif delta is not None:
+            deltas[ref] = deltas.get(ref, 0) + delta
+        else:
+            absolutes[ref] = (quantity, expected)
+
+    if errors:
+        raise StockUpdateError('Invalid stock updates.', errors)
+    return deltas, absolutes
+
+
+def _resolve_ids(refs):
+    names = [value for kind, value in refs if kind == 'name']
+    ids = [value for kind, value in refs if kind == 'id']
+    resolved = {}
+    if names:
+        resolved.update({('name', name): product_id for name, product_id in db.session.execute(
+            select(Product.name, Product.id).where(Product.name.in_(names)))})
+    if ids:
+        resolved.update({('id', product_id): product_id for (product_id,) in db.session.execute(
+            select(Product.id).where(Product.id.in_(ids)))})
+    return resolved
+
+
+def _execute_many(statement, params):
+    # One executemany where the driver reports its total rowcount reliably,
+    # otherwise one statement per row inside the same transaction.
+    if not params:
+        return 0
+    if db.session.get_bind().dialect.supports_sane_multi_rowcount:
+        return db.session.execute(statement, params).rowcount
+    return sum(db.session.execute(statement, row).rowcount for row in params)
+
+
+def apply_stock_updates(updates):
+    # Applies every update in one transaction with set-based UPDATEs. Deltas
+    # are relative (so they commute with checkout reservations) and refuse to
+    # go below zero; absolute quantities can carry expected_quantity as a
+    # compare-and-set guard. Any conflict rolls back the whole batch.
+    deltas, absolutes = parse_stock_updates(updates)
+    try:
+        ids = _resolve_ids(set(deltas) | set(absolutes))
+        missing = [{'product': value, 'error': 'Product not found.'}
+                   for kind, value in set(deltas) | set(absolutes) if (kind, value) not in ids]
+        if missing:
+            raise UnknownProductError('Unknown products.', missing)
+
+        table = Product.__table__
+        delta_params = [{'b_id': ids[ref], 'b_delta': delta} for ref, delta in deltas.items()]
+        set_params = [{'b_id': ids[ref], 'b_quantity': quantity}
+                      for ref, (quantity, expected) in absolutes.items() if expected is None]
+        cas_params = [{'b_id': ids[ref], 'b_quantity': quantity, 'b_expected': expected}
+                      for ref, (quantity, expected) in absolutes.items() if expected is not None]
+
+        applied = _execute_many(
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.quantity + bindparam('b_delta') >= 0)
+            .values(quantity=table.c.quantity + bindparam('b_delta')),
+            delta_params)
+        applied += _execute_many(
+            update(table).where(table.c.id == bindparam('b_id')).values(quantity=bindparam('b_quantity')),
+            set_params)
+        applied += _execute_many(
+            update(table)
+            .where(table.c.id == bindparam('b_id'), table.c.quantity == bindparam('b_expected'))
+            .values(quantity=bindparam('b_quantity')),
+            cas_params)
+
+        expected_count = len(delta_params) + len(set_params) + len(cas_params)
+        if applied != expected_count:
+            db.session.rollback()
+            raise StockConflictError('Stock changed concurrently or would become negative.',
+                                     _find_conflicts(delta_params, cas_params))
+
+        db.session.commit()
+        return applied
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _find_conflicts(delta_params, cas_params):
+    product_ids = [row['b_id'] for row in delta_params + cas_params]
+    current = dict(db.session.execute(select(Product.id, Product.quantity).where(Product.id.in_(product_ids))).all())
+    conflicts = []
+    for row in delta_params:
+        if current.get(row['b_id'], 0) + row['b_delta'] < 0:
+            conflicts.append({'product': row['b_id'], 'quantity': current.get(row['b_id']),
+                              'error': 'Delta would make the quantity negative.'})
+    for row in cas_params:
+        if current.get(row['b_id']) != row['b_expected']:
+            conflicts.append({'product': row['b_id'], 'quantity': current.get(row['b_id']),
+                              'error': 'Quantity does not match expected_quantity.'})
+    return conflicts
@@ -0,0 +1,87 @@
+from sqlalchemy import func, insert, select, update
+from app import db
+from app.models import Transaction, User
+from app.money import to_money
+
+TOPUP = 'topup'
+PURCHASE = 'purchase'
+ADJUSTMENT = 'adjustment'
+OPENING = 'opening'
+
+
+class LedgerError(Exception):
+    pass
+
+
+def record_transaction(user_id, amount, kind, order_id=None, expected_balance=None, extra_values=None):
+    # Appends a ledger row and applies it to the cached Users.balance with a
+    # conditional UPDATE in the same transaction, so concurrent top-ups and
+    # debits never lose each other's changes. Debits cannot overdraw the
+    # balance; expected_balance turns the update into a compare-and-set.
+    # extra_values are applied to the Users row by the same UPDATE. The
+    # caller commits.
+    amount = to_money(amount)
+    balance = func.coalesce(User.balance, 0)
+    conditions = [User.user_id == user_id]
+    if amount < 0:
+        conditions.append(balance + amount >= 0)
+    if expected_balance is not None:
+        conditions.append(balance == expected_balance)
+
+    result = db.session.execute(
+        update(User).where(*conditions).values(balance=balance + amount, **(extra_values or {})))
+    if result.rowcount != 1:
+        if expected_balance is not None:
+            raise LedgerError('Balance changed since it was read.')
+        raise LedgerError('Insufficient balance.')
+    db.session.execute(insert(Transaction).values(user_id=user_id, amount=amount, kind=kind, order_id=order_id))
+
+
+def top_up(user_id, amount):
+    try:
+        record_transaction(user_id, amount, TOPUP)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def set_balance(user_id, current_balance, new_balance):
+    # Admin override: recorded as an adjustment of the difference, applied
+    # only if the balance is still the one the admin saw.
+    delta = to_money(new_balance) - to_money(current_balance or 0)
+    if delta:
+        record_transaction(user_id, delta, ADJUSTMENT, expected_balance=current_balance or 0)
+
+
+def ledger_totals():
+    return (select(Transaction.user_id, func.sum(Transaction.amount).label('total'))
+            .group_by(Transaction.user_id)
+            .subquery())
+
+
+def find_balance_mismatches():
+    # One grouped query over the ledger instead of replaying it per user.
+    totals = ledger_totals()
+    ledger_balance = func.coalesce(totals.c.total, 0)
+    return db.session.execute(
+        select(User.user_id, User.username, User.balance, ledger_balance.label('ledger_balance'))
+        .outerjoin(totals, totals.c.user_id == User.user_id)
+        .where(func.coalesce(User.balance, 0) != ledger_balance)
+        .order_by(User.user_id)
+    ).all()
+
+
+def rebuild_balances(user_ids):
+    ledger_balance = select(func.coalesce(func.sum(Transaction.amount), 0)) \
+        .where(Transaction.user_id == User.user_id).scalar_subquery()
+    try:
+        result = db.session.execute(
+            update(User).where(User.user_id.in_(user_ids)).values(balance=ledger_balance),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+        return result.rowcount
+    except Exception:
+        db.session.rollback()
+        raise
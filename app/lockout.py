@@ -0,0 +1,155 @@
+import random
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import case, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import LoginAttempt
+
+
+def get_lockout_store():
+    store = current_app.extensions.get('lockout_store')
+    if store is None:
+        backend = current_app.config['LOCKOUT_BACKEND']
+        window = current_app.config['LOCKOUT_WINDOW_SECONDS']
+        if backend == 'sql':
+            store = SQLLockoutStore(window)
+        elif backend == 'memory':
+            store = MemoryLockoutStore(window, current_app.config['LOCKOUT_MAX_ENTRIES'])
+        else:
+            raise ValueError(f'Unknown LOCKOUT_BACKEND: {backend}')
+        current_app.extensions['lockout_store'] = store
+    return store
+
+
+class MemoryLockoutStore:
+    # Per-process store for single-worker deployments. Entries expire once both
+    # the attempt window and any lock have passed, and the least recently used
+    # entries are evicted beyond max_entries.
+
+    def __init__(self, window_seconds, max_entries):
+        self.window = timedelta(seconds=window_seconds)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, username, now):
+        entry = self._entries.get(username)
+        if entry is None:
+            return None
+        failed_attempts, last_failure_at, locked_until = entry
+        if last_failure_at + self.window < now and (locked_until is None or locked_until < now):
+            del self._entries[username]
+            return None
+        self._entries.move_to_end(username)
+        return entry
+
+    def register_failure(self, username):
+        now = datetime.now()
+        with self._lock:
+            entry = self._get(username, now)
+            if entry is None:
+                entry = [0, now, None]
+                self._entries[username] = entry
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            entry[0] += 1
+            entry[1] = now
+            return entry[0]
+
+    def lock(self, username, duration_minutes):
+        now = datetime.now()
+        with self._lock:
+            entry = self._get(username, now)
+            if entry is not None:
+                entry[2] = now + timedelta(minutes=duration_minutes)
+
+    def locked_until(self, username):
+        now = datetime.now()
+        with self._lock:
+            entry = self._get(username, now)
+            if entry is not None and entry[2] is not None and entry[2] > now:
+                return entry[2]
+        return None
+
+    def reset(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+
+class SQLLockoutStore:
+    # Shared by every worker through the LoginAttempts table. Counters are
+    # updated in place by primary key, and expired rows are purged occasionally.
+
+    def __init__(self, window_seconds, purge_probability=0.01):
+        self.window = timedelta(seconds=window_seconds)
+        self.purge_probability = purge_probability
+
+    def register_failure(self, username):
+        now = datetime.now()
+        try:
+            if not self._increment(username, now):
+                try:
+                    db.session.execute(insert(LoginAttempt).values(
+                        username=username, failed_attempts=1, last_failure_at=now))
+                except IntegrityError:
+                    # Another worker inserted the row first
+                    db.session.rollback()
+                    self._increment(username, now)
+            if random.random() < self.purge_probability:
+                self.purge(now)
+            failed_attempts = db.session.scalar(
+                select(LoginAttempt.failed_attempts).where(LoginAttempt.username == username))
+            db.session.commit()
+            return failed_attempts
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _increment(self, username, now):
+        failed_attempts = case(
+            (LoginAttempt.last_failure_at < now - self.window, 1),
+            else_=LoginAttempt.failed_attempts + 1,
+        )
+        result = db.session.execute(
+            update(LoginAttempt)
+            .where(LoginAttempt.username == username)
+            .values(failed_attempts=failed_attempts, last_failure_at=now),
+            execution_options={'synchronize_session': False},
+        )
+        return result.rowcount == 1
+
+    def lock(self, username, duration_minutes):
+        db.session.execute(
+            update(LoginAttempt)
+            .where(LoginAttempt.username == username)
+            .values(locked_until=datetime.now() + timedelta(minutes=duration_minutes)),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+    def locked_until(self, username):
+        locked_until = db.session.scalar(
+            select(LoginAttempt.locked_until).where(LoginAttempt.username == username))
+        if locked_until is not None and locked_until > datetime.now():
+            return locked_until
+        return None
+
+    def reset(self, username):
+        db.session.execute(
+            delete(LoginAttempt).where(LoginAttempt.username == username),
+            execution_options={'synchronize_session': False},
+        )
+        db.session.commit()
+
+    def purge(self, now=None):
+        now = now or datetime.now()
+        db.session.execute(
+            delete(LoginAttempt).where(
+                LoginAttempt.last_failure_at < now - self.window,
+                or_(LoginAttempt.locked_until.is_(None), LoginAttempt.locked_until < now),
+            ),
+            execution_options={'synchronize_session': False},
+        )
@@ -1,6 +1,7 @@
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 from app import db
+from app.passwords import hash_password, verify_password, needs_rehash
+from app.money import Money, ZERO
 from datetime import datetime, timedelta
 
 class User(UserMixin, db.Model):
@@ -9,18 +10,23 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String, nullable=False, unique=True)
     password_hash = db.Column(db.String, nullable=False)
     email = db.Column(db.String, nullable=False, unique=True)
-    balance = db.Column(db.Float, default=0.0)
+    balance = db.Column(Money, default=0)
     is_admin = db.Column(db.Boolean, default=False)
+    order_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    total_spent = db.Column(Money, nullable=False, default=0, server_default='0')
 
     cart_items = db.relationship("Cart", back_populates="user", cascade="all, delete")
     orders = db.relationship("Order", back_populates="user", cascade="all, delete")
     transactions = db.relationship("Transaction", back_populates="user", cascade="all, delete")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)
 
     def get_id(self):
         return str(self.user_id)
@@ -39,37 +45,47 @@ class User(UserMixin, db.Model):
     def increment_failed_login_attempts(self):
         self.failed_login_attempts += 1
 
+    # order_count and total_spent are maintained by checkout and can be
+    # recomputed with `flask backfill-loyalty-stats`.
     def total_amount_spent(self):
-        return sum(order.total for order in self.orders)
+        return self.total_spent or ZERO
 
     def total_orders(self):
-        return len(self.orders)
+        return self.order_count or 0
 
     def is_eligible_for_discount(self):
-        return self.total_orders() > 3 or self.total_amount_spent() > 500.0
+        return self.total_orders() > 3 or self.total_amount_spent() > 500
 
 class Product(db.Model):
     __tablename__ = 'Products'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), index=True, unique=True)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(Money, nullable=False)
     quantity = db.Column(db.Integer, default=0)
     description = db.Column(db.String(500))
-    category = db.Column(db.String, nullable=False)
+    category = db.Column(db.String, nullable=False, index=True)
     image_path = db.Column(db.String, nullable=True, default='assets/images/product_images/Placeholder.jpg')
 
     cart_items = db.relationship("Cart", back_populates="product", cascade="all, delete")
     order_items = db.relationship("OrderItem", back_populates="product", cascade="all, delete")
     discounts = db.relationship('Discount', back_populates='product', cascade="all, delete")
+    image_variants = db.relationship('ProductImageVariant', back_populates='product', cascade="all, delete")
+
+class ProductImageVariant(db.Model):
+    __tablename__ = 'ProductImageVariants'
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False, index=True)
+    path = db.Column(db.String, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
 
-    def get_discounted_price(self):
-        if self.discounts:
-            discount = self.discounts[0].discount_percentage
-            return self.price * (1 - discount / 100)
-        return self.price
+    product = db.relationship('Product', back_populates='image_variants')
 
 class Cart(db.Model):
     __tablename__ = 'Cart'
+    # Also serves every lookup by user_id alone (leftmost column)
+    __table_args__ = (db.Index('ix_Cart_user_id_product_id', 'user_id', 'product_id', unique=True),)
     cart_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False)
@@ -80,9 +96,10 @@ class Cart(db.Model):
 
 class Order(db.Model):
     __tablename__ = 'Orders'
+    __table_args__ = (db.Index('ix_Orders_user_id_order_date', 'user_id', 'order_date'),)
     order_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), nullable=False)
-    total = db.Column(db.Float, nullable=False)
+    total = db.Column(Money, nullable=False)
     order_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
 
     user = db.relationship("User", back_populates="orders")
@@ -91,30 +108,46 @@ class Order(db.Model):
 class OrderItem(db.Model):
     __tablename__ = 'OrderItems'
     order_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(Money, nullable=False)
 
     order = db.relationship("Order", back_populates="order_items")
     product = db.relationship("Product", back_populates="order_items")
 
 class Transaction(db.Model):
     __tablename__ = 'Transactions'
+    __table_args__ = (db.Index('ix_Transactions_user_id_transaction_id', 'user_id', 'transaction_id'),)
     transaction_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey('Users.user_id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(Money, nullable=False)
     transaction_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp())
+    kind = db.Column(db.String(20), nullable=False, server_default='topup')
+    order_id = db.Column(db.Integer, db.ForeignKey('Orders.order_id'), nullable=True, index=True)
 
     user = db.relationship("User", back_populates="transactions")
 
+# The ledger is append-only: corrections are new rows (see app.ledger).
+@db.event.listens_for(Transaction, 'before_update')
+def _reject_transaction_update(mapper, connection, target):
+    raise ValueError('Transactions are append-only and cannot be modified.')
+
 class Discount(db.Model):
     __tablename__ = 'Discounts'
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('Products.id'), nullable=False, unique=True, index=True)
     discount_percentage = db.Column(db.Float, nullable=False)
 
     product = db.relationship('Product', back_populates='discounts')
 
     def __repr__(self):
         return f'<Product {self.product.name}>'
+
+
+class LoginAttempt(db.Model):
+    __tablename__ = 'LoginAttempts'
+    username = db.Column(db.String, primary_key=True)
+    failed_attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_failure_at = db.Column(db.DateTime, nullable=False, index=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
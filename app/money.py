@@ -0,0 +1,40 @@
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy.sql import operators
+from sqlalchemy.types import BigInteger, TypeDecorator
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def to_money(value):
+    # Decimal rounded half-up to whole cents; floats go through str() so
+    # 0.1 becomes 0.10 rather than 0.1000000000000000055...
+    if value is None:
+        return None
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Money(TypeDecorator):
+    # Stored as 64-bit integer cents, so SUM() and comparisons in SQL are
+    # exact; Python code always sees Decimal amounts with two places.
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(to_money(value) * 100)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return (Decimal(value) / 100).quantize(CENT)
+
+    def coerce_compared_value(self, op, value):
+        # Literals in "balance >= :total" or "balance - :total" are amounts
+        # too; factors and divisors such as "price * 2" are plain numbers.
+        if operators.is_comparison(op) or op in (operators.add, operators.sub):
+            return self
+        return self.impl_instance.coerce_compared_value(op, value)
@@ -0,0 +1,65 @@
+from collections import namedtuple
+from datetime import timezone
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import and_, or_, select
+from app.database import read_session
+from app.models import Order, OrderItem, Product
+from app.pagination import Page
+
+OrderSummary = namedtuple('OrderSummary', ['order_id', 'order_date', 'total', 'items'])
+OrderLine = namedtuple('OrderLine', ['product_name', 'quantity', 'price'])
+
+
+def format_order_date(order_date):
+    # Orders.order_date is written by CURRENT_TIMESTAMP, i.e. naive UTC.
+    if order_date is None:
+        return ''
+    local = order_date.replace(tzinfo=timezone.utc).astimezone(ZoneInfo(current_app.config['DISPLAY_TIMEZONE']))
+    return local.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def get_order_history(user_id, after=None, before=None, per_page=20):
+    # Newest first, seeking on (order_date, order_id). Returns plain records
+    # built from two queries: one page of orders, then all of their lines.
+    session = read_session()
+    query = select(Order.order_id, Order.order_date, Order.total).where(Order.user_id == user_id)
+    newest_first = (Order.order_date.desc(), Order.order_id.desc())
+
+    if before is not None:
+        cursor_date = select(Order.order_date).where(Order.order_id == before).scalar_subquery()
+        query = query.where(or_(Order.order_date > cursor_date,
+                                and_(Order.order_date == cursor_date, Order.order_id > before)))
+        rows = session.execute(
+            query.order_by(Order.order_date, Order.order_id).limit(per_page + 1)).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        next_cursor = rows[-1].order_id if rows else None
+        prev_cursor = rows[0].order_id if has_more else None
+    else:
+        if after is not None:
+            cursor_date = select(Order.order_date).where(Order.order_id == after).scalar_subquery()
+            query = query.where(or_(Order.order_date < cursor_date,
+                                    and_(Order.order_date == cursor_date, Order.order_id < after)))
+        rows = session.execute(query.order_by(*newest_first).limit(per_page + 1)).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = rows[-1].order_id if has_more else None
+        prev_cursor = rows[0].order_id if after is not None and rows else None
+
+    lines = {row.order_id: [] for row in rows}
+    if lines:
+        items = session.execute(
+            select(OrderItem.order_id, Product.name, OrderItem.quantity, OrderItem.price)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id.in_(list(lines)))
+            .order_by(OrderItem.order_item_id)
+        )
+        for order_id, product_name, quantity, price in items:
+            lines[order_id].append(OrderLine(product_name, quantity, price))
+
+    orders = [
+        OrderSummary(row.order_id, format_order_date(row.order_date), row.total, lines[row.order_id])
+        for row in rows
+    ]
+    return Page(orders, per_page, next_cursor, prev_cursor)
@@ -0,0 +1,69 @@
+import bisect
+from collections import namedtuple
+from flask import current_app, request, url_for
+
+Page = namedtuple('Page', ['items', 'per_page', 'next_cursor', 'prev_cursor'])
+
+
+def get_page_args():
+    per_page = request.args.get('per_page', type=int) or current_app.config['PER_PAGE']
+    per_page = max(1, min(per_page, current_app.config['MAX_PER_PAGE']))
+    return request.args.get('after', type=int), request.args.get('before', type=int), per_page
+
+
+def page_url(**cursor):
+    args = request.args.to_dict()
+    args.pop('after', None)
+    args.pop('before', None)
+    args.update(cursor)
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+
+def paginate_query(query, column, after=None, before=None, per_page=20):
+    # Seek pagination on a unique, indexed column: the page boundary is a
+    # WHERE clause rather than an OFFSET, so deep pages cost the same as the first.
+    if before is not None:
+        rows = query.filter(column < before).order_by(column.desc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        next_cursor = getattr(rows[-1], column.key) if rows else None
+        prev_cursor = getattr(rows[0], column.key) if has_more else None
+    else:
+        if after is not None:
+            query = query.filter(column > after)
+        rows = query.order_by(column).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        rows = rows[:per_page]
+        next_cursor = getattr(rows[-1], column.key) if has_more else None
+        prev_cursor = getattr(rows[0], column.key) if after is not None and rows else None
+    return Page(rows, per_page, next_cursor, prev_cursor)
+
+
+def paginate_list(items, after=None, before=None, per_page=20, key=lambda item: item.id, ordered=True):
+    # Same cursors as paginate_query, for in-memory sequences such as the
+    # catalog. Ordered sequences are sorted by key and are sought with bisect;
+    # otherwise (e.g. ranked search results) the cursor is located by position.
+    if ordered:
+        keys = [key(item) for item in items]
+        if before is not None:
+            end = bisect.bisect_left(keys, before)
+        elif after is not None:
+            start = bisect.bisect_right(keys, after)
+    else:
+        positions = {key(item): index for index, item in enumerate(items)}
+        if before is not None:
+            end = positions.get(before, 0)
+        elif after is not None:
+            start = positions[after] + 1 if after in positions else 0
+
+    if before is not None:
+        start = max(0, end - per_page)
+    else:
+        if after is None:
+            start = 0
+        end = start + per_page
+
+    rows = list(items[start:end])
+    next_cursor = key(rows[-1]) if rows and end < len(items) else None
+    prev_cursor = key(rows[0]) if rows and start > 0 else None
+    return Page(rows, per_page, next_cursor, prev_cursor)
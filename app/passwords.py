@@ -0,0 +1,140 @@
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+
+class HashingBusyError(Exception):
+    pass
+
+
+_lock = threading.Lock()
+_executor = None
+_slots = None
+_method_prefixes = {}
+_stats = {'submitted': 0, 'rejected': 0, 'failed': 0, 'in_flight': 0, 'completed': 0, 'total_seconds': 0.0}
+
+
+def _init_pool():
+    # Created lazily so every (forked) web worker gets its own pool, and
+    # again after a broken pool has been discarded.
+    global _executor, _slots
+    with _lock:
+        if _executor is None and current_app.config['PASSWORD_HASH_WORKERS'] > 0:
+            # Forking a threaded web worker can copy held locks into the
+            # child and deadlock it, so start workers from a clean process.
+            _executor = ProcessPoolExecutor(max_workers=current_app.config['PASSWORD_HASH_WORKERS'],
+                                            mp_context=multiprocessing.get_context('forkserver'))
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(current_app.config['PASSWORD_HASH_MAX_PENDING'])
+
+
+def _run(func, *args):
+    if _slots is None or _executor is None:
+        _init_pool()
+    executor = _executor
+
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats['rejected'] += 1
+        logger.warning('Password hashing queue is full, rejecting request.')
+        raise HashingBusyError('The server is busy. Please try again in a moment.')
+
+    started = time.monotonic()
+    with _lock:
+        _stats['submitted'] += 1
+        _stats['in_flight'] += 1
+
+    if executor is None:
+        try:
+            result = func(*args)
+        except Exception:
+            _slots.release()
+            _finish(started, failed=True)
+            raise
+        _slots.release()
+        _finish(started)
+        return result
+
+    try:
+        future = executor.submit(func, *args)
+    except BrokenProcessPool:
+        _slots.release()
+        _finish(started, failed=True)
+        _discard_pool(executor)
+        raise HashingBusyError('The server is busy. Please try again in a moment.')
+    except Exception:
+        _slots.release()
+        _finish(started, failed=True)
+        raise
+    # The slot is held until the job really finishes, even if we stop
+    # waiting for it, so abandoned jobs still count against MAX_PENDING.
+    future.add_done_callback(lambda done: _job_done(done, started))
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except FuturesTimeoutError:
+        logger.warning('Password hashing timed out.')
+        raise HashingBusyError('The server is busy. Please try again in a moment.')
+    except BrokenProcessPool:
+        _discard_pool(executor)
+        raise HashingBusyError('The server is busy. Please try again in a moment.')
+
+
+def _discard_pool(executor):
+    # A worker died (OOM kill, crash) and the pool refuses new work; drop it
+    # so the next call starts a fresh one.
+    global _executor
+    with _lock:
+        if _executor is not executor:
+            return
+        logger.error('Password hashing pool is broken, discarding it.')
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_done(future, started):
+    _slots.release()
+    _finish(started, failed=future.cancelled() or future.exception() is not None)
+
+
+def _finish(started, failed=False):
+    with _lock:
+        _stats['in_flight'] -= 1
+        _stats['completed'] += 1
+        _stats['total_seconds'] += time.monotonic() - started
+        if failed:
+            _stats['failed'] += 1
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def verify_password(password_hash, password):
+    return _run(check_password_hash, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != _method_prefix(current_app.config['PASSWORD_HASH_METHOD'])
+
+
+def _method_prefix(method):
+    # Werkzeug stores shorthand methods expanded ("scrypt" as
+    # "scrypt:32768:8:1"), so compare against the prefix it really writes.
+    prefix = _method_prefixes.get(method)
+    if prefix is None:
+        prefix = _method_prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+    return prefix
+
+
+def password_hashing_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['average_seconds'] = stats['total_seconds'] / stats['completed'] if stats['completed'] else 0.0
+    return stats
@@ -0,0 +1,33 @@
+from collections import namedtuple
+from decimal import Decimal
+from app import db
+from app.money import to_money
+
+PriceRecord = namedtuple('PriceRecord', ['product_id', 'price', 'discount_percentage', 'discounted_price'])
+
+
+def apply_discount(price, discount_percentage):
+    if discount_percentage:
+        return to_money(price * (1 - Decimal(str(discount_percentage)) / 100))
+    return price
+
+
+def get_prices(product_ids=None, session=None):
+    # Resolves base and discounted prices for many products in one query,
+    # instead of lazy-loading Product.discounts row by row.
+    from app.models import Product, Discount
+
+    query = (session or db.session).query(Product.id, Product.price, db.func.max(Discount.discount_percentage)) \
+        .outerjoin(Discount, Discount.product_id == Product.id) \
+        .group_by(Product.id, Product.price)
+
+    if product_ids is not None:
+        product_ids = set(product_ids)
+        if not product_ids:
+            return {}
+        query = query.filter(Product.id.in_(product_ids))
+
+    return {
+        product_id: PriceRecord(product_id, price, discount_percentage, apply_discount(price, discount_percentage))
+        for product_id, price, discount_percentage in query
+    }
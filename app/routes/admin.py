@@ -1,8 +1,19 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, current_app, render_template, redirect, url_for, flash, request, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 from app import db
 from app.models import Product, Discount, User
-from forms import ProductForm, DiscountForm, UserForm
+from app.catalog import invalidate_catalog
+from app.user_cache import invalidate_user
+from app.passwords import HashingBusyError, password_hashing_stats
+from app.images import ImageUploadError, save_upload, set_product_image, submit_variant_generation
+from app.bulk import FORMATS as EXPORT_FORMATS, detect_format, export_products as bulk_export_products, import_products as bulk_import_products
+from app.pagination import get_page_args, paginate_query
+from app.database import read_session
+from app.ledger import OPENING, LedgerError, record_transaction, set_balance
+from app.accounts import find_user_conflicts, user_conflict_errors
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from forms import ProductForm, ProductImageForm, ProductImportForm, DiscountForm, UserForm
 import re
 
 admin_bp = Blueprint('admin', __name__)
@@ -15,6 +26,16 @@ def admin_dashboard():
         return redirect(url_for('user.shop'))
     return render_template('admin/admin.html')
 
+@admin_bp.route('/admin/metrics')
+@login_required
+def metrics():
+    if not current_user.is_admin:
+        return jsonify({'error': 'Admin access required.'}), 403
+    return jsonify({
+        'password_hashing': password_hashing_stats(),
+        'startup': current_app.extensions['startup_timer'].as_dict(),
+    })
+
 @admin_bp.route('/admin/add_product', methods=['GET', 'POST'])
 @login_required
 def add_product():
@@ -44,6 +65,7 @@ def add_product():
                     )
                     db.session.add(product)
                     db.session.commit()
+                    invalidate_catalog()
                     flash('Product added successfully.')
                     return redirect(url_for('admin.admin_dashboard'))
                 except Exception as e:
@@ -57,8 +79,51 @@ def list_products():
     if not current_user.is_admin:
         flash('Admin access required.')
         return redirect(url_for('user.shop'))
-    products = Product.query.all()
-    return render_template('admin/list_products.html', products=products)
+    page = paginate_query(read_session().query(Product), Product.id, *get_page_args())
+    return render_template('admin/list_products.html', products=page.items, page=page)
+
+@admin_bp.route('/admin/products/import', methods=['GET', 'POST'])
+@login_required
+def import_products():
+    if not current_user.is_admin:
+        flash('Admin access required.', 'danger')
+        return redirect(url_for('user.shop'))
+
+    form = ProductImportForm()
+    report = None
+
+    if request.method == 'POST':
+        if not form.validate():
+            for fieldName, errorMessages in form.errors.items():
+                for err in errorMessages:
+                    flash(f'Error in {fieldName}: {err}', 'danger')
+        else:
+            try:
+                upload = form.file.data
+                report = bulk_import_products(upload.stream, detect_format(upload.filename))
+                invalidate_catalog()
+                flash(f'Import finished: {report.created} created, {report.updated} updated, {len(report.errors)} errors.',
+                      'success' if not report.errors else 'warning')
+            except Exception as e:
+                flash(f'An error occurred while importing products: {str(e)}', 'danger')
+
+    return render_template('admin/import_products.html', form=form, report=report)
+
+@admin_bp.route('/admin/products/export')
+@login_required
+def export_products():
+    if not current_user.is_admin:
+        flash('Admin access required.', 'danger')
+        return redirect(url_for('user.shop'))
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        flash('Unsupported export format.', 'danger')
+        return redirect(url_for('admin.admin_dashboard'))
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(bulk_export_products(fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=products.{fmt}'})
 
 @admin_bp.route('/admin/update_product_quantity/<int:product_id>', methods=['GET', 'POST'])
 @login_required
@@ -79,6 +144,7 @@ def update_product_quantity(product_id):
             try:
                 product.quantity = form.quantity.data
                 db.session.commit()
+                invalidate_catalog()
                 flash('Product quantity updated successfully.', 'success')
                 return redirect(url_for('admin.list_products'))
             except Exception as e:
@@ -86,6 +152,36 @@ def update_product_quantity(product_id):
     
     return render_template('admin/update_product_quantity.html', form=form, product_id=product_id)
 
+@admin_bp.route('/admin/upload_product_image/<int:product_id>', methods=['GET', 'POST'])
+@login_required
+def upload_product_image(product_id):
+    if not current_user.is_admin:
+        flash('Admin access required.', 'danger')
+        return redirect(url_for('user.shop'))
+
+    product = Product.query.get_or_404(product_id)
+    form = ProductImageForm()
+
+    if request.method == 'POST':
+        if not form.validate():
+            for fieldName, errorMessages in form.errors.items():
+                for err in errorMessages:
+                    flash(f'Error in {fieldName}: {err}', 'danger')
+        else:
+            try:
+                image_path = save_upload(form.image.data)
+                set_product_image(product, image_path)
+                invalidate_catalog()
+                submit_variant_generation(product.id, image_path)
+                flash('Image uploaded. Thumbnails are being generated.', 'success')
+                return redirect(url_for('admin.list_products'))
+            except ImageUploadError as e:
+                flash(str(e), 'danger')
+            except Exception as e:
+                flash(f'An error occurred while uploading the image: {str(e)}', 'danger')
+
+    return render_template('admin/upload_product_image.html', form=form, product=product)
+
 @admin_bp.route('/admin/remove_product/<int:product_id>', methods=['POST'])
 @login_required
 def remove_product(product_id):
@@ -95,6 +191,7 @@ def remove_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product)
     db.session.commit()
+    invalidate_catalog()
     flash('Product removed successfully.', 'success')
     return redirect(url_for('admin.list_products'))
 
@@ -119,6 +216,7 @@ def set_discount():
                 discount = Discount(product_id=product_id, discount_percentage=discount_percentage)
                 db.session.add(discount)
                 db.session.commit()
+                invalidate_catalog()
                 flash('Discount set successfully.', 'success')
                 return redirect(url_for('admin.list_discounts'))
             except Exception as e:
@@ -132,9 +230,8 @@ def list_discounts():
     if not current_user.is_admin:
         flash('Admin access required.')
         return redirect(url_for('user.shop'))
-    discounts = Discount.query.all()
-    products = {product.id: product.name for product in Product.query.all()}
-    return render_template('admin/list_discounts.html', discounts=discounts, products=products)
+    page = paginate_query(read_session().query(Discount).options(joinedload(Discount.product)), Discount.id, *get_page_args())
+    return render_template('admin/list_discounts.html', discounts=page.items, page=page)
 
 @admin_bp.route('/admin/update_discount/<int:discount_id>', methods=['GET', 'POST'])
 @login_required
@@ -147,6 +244,7 @@ def update_discount(discount_id):
     if discount_percentage is not None:
         discount.discount_percentage = float(discount_percentage)
         db.session.commit()
+        invalidate_catalog()
         flash('Discount updated successfully.', 'success')
     else:
         flash('Invalid data.', 'danger')
@@ -161,6 +259,7 @@ def remove_discount(discount_id):
     discount = Discount.query.get_or_404(discount_id)
     db.session.delete(discount)
     db.session.commit()
+    invalidate_catalog()
     flash('Discount removed successfully.', 'success')
     return redirect(url_for('admin.list_discounts'))
 
@@ -198,11 +297,8 @@ def create_user():
         if password != confirm_password:
             errors.append('Passwords do not match.')
 
-        if User.query.filter_by(username=username).first():
-            errors.append('Username already taken. Please choose a different one.')
-
-        if User.query.filter_by(email=email).first():
-            errors.append('Email address already registered. Please use a different one.')
+        if username and email:
+            errors.extend(find_user_conflicts(username, email).values())
 
         if errors or not form.validate():
             for error in errors:
@@ -215,16 +311,24 @@ def create_user():
         user = User(
             username=username, 
             email=email, 
-            balance=form.balance.data, 
             is_admin=form.is_admin.data
         )
-        user.set_password(password)
-        
         try:
+            user.set_password(password)
             db.session.add(user)
+            db.session.flush()
+            if form.balance.data:
+                record_transaction(user.user_id, form.balance.data, OPENING)
             db.session.commit()
             flash('User created successfully.', 'success')
             return redirect(url_for('admin.list_users'))
+        except HashingBusyError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        except IntegrityError:
+            db.session.rollback()
+            for error in user_conflict_errors(username, email):
+                flash(error, 'danger')
         except Exception as e:
             db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
@@ -241,11 +345,14 @@ def update_user(user_id):
     user = User.query.get_or_404(user_id)
     form = UserForm(obj=user, update=True)
     form.submit.label.text = 'Update User'
+    if request.method == 'GET':
+        form.expected_balance.data = user.balance
 
     if request.method == 'POST':
         username = form.username.data
         email = form.email.data
         balance = form.balance.data
+        expected_balance = form.expected_balance.data
         is_admin = form.is_admin.data
         password = form.password.data
 
@@ -259,13 +366,8 @@ def update_user(user_id):
         elif not re.match(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$', email):
             errors.append('Invalid email format. Must be in the format name@domain.com.')
 
-        existing_user_username = User.query.filter(User.user_id != user.user_id, User.username == username).first()
-        existing_user_email = User.query.filter(User.user_id != user.user_id, User.email == email).first()
-
-        if existing_user_username:
-            errors.append('Username already taken. Please choose a different one.')
-        if existing_user_email:
-            errors.append('Email address already registered. Please use a different one.')
+        if username and email:
+            errors.extend(find_user_conflicts(username, email, exclude_user_id=user.user_id).values())
 
         if errors or not form.validate():
             for error in errors:
@@ -277,18 +379,34 @@ def update_user(user_id):
 
         user.username = username
         user.email = email
-        user.balance = balance
         user.is_admin = is_admin
-        if password:
-            if not re.match(r'^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d]{8,}$', password):
-                flash('Password must be at least 8 characters long, include letters and numbers.', 'danger')
-                return render_template('admin/update_user.html', form=form, user_id=user_id)
-            user.set_password(password)
+        if password and not re.match(r'^(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d]{8,}$', password):
+            flash('Password must be at least 8 characters long, include letters and numbers.', 'danger')
+            return render_template('admin/update_user.html', form=form, user_id=user_id)
         try:
+            if password:
+                user.set_password(password)
+            if balance is not None:
+                set_balance(user.user_id, expected_balance, balance)
             db.session.commit()
+            invalidate_user(user.user_id)
             flash('User updated successfully.', 'success')
             return redirect(url_for('admin.list_users'))
+        except HashingBusyError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
+        except LedgerError:
+            db.session.rollback()
+            form.expected_balance.raw_data = None
+            form.expected_balance.data = user.balance
+            flash(f'The balance changed to {user.balance or 0:.2f} while you were editing. '
+                  'Review it and submit again.', 'danger')
+        except IntegrityError:
+            db.session.rollback()
+            for error in user_conflict_errors(username, email, exclude_user_id=user_id):
+                flash(error, 'danger')
         except Exception as e:
+            db.session.rollback()
             flash(f'Error: {str(e)}', 'danger')
     
     return render_template('admin/update_user.html', form=form, user_id=user_id)
@@ -301,8 +419,8 @@ def list_users():
     if not current_user.is_admin:
         flash('Admin access required.')
         return redirect(url_for('user.shop'))
-    users = User.query.all()
-    return render_template('admin/list_users.html', users=users)
+    page = paginate_query(read_session().query(User), User.user_id, *get_page_args())
+    return render_template('admin/list_users.html', users=page.items, page=page)
 
 @admin_bp.route('/admin/remove_user/<int:user_id>', methods=['POST'])
 @login_required
@@ -313,5 +431,6 @@ def remove_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user(user_id)
     flash('User removed successfully.', 'success')
     return redirect(url_for('admin.list_users'))
@@ -0,0 +1,174 @@
+import hmac
+from functools import wraps
+from flask import Blueprint, current_app, jsonify, request, url_for
+from flask_login import current_user
+from app.catalog import get_catalog, invalidate_catalog
+from app.helpers import get_products_and_categories
+from app.cart import CartError, get_cart_summary, add_to_cart, remove_from_cart
+from app.checkout import CheckoutError, place_order
+from app.inventory import StockConflictError, StockUpdateError, UnknownProductError, apply_stock_updates
+from app.user_cache import invalidate_user
+from app.pagination import get_page_args, paginate_list
+
+api_bp = Blueprint('api', __name__)
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required.'}), 401
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def inventory_auth_required(view):
+    # Admin sessions, or a bearer token for warehouse/ERP sync jobs when
+    # INVENTORY_API_TOKEN is configured.
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = current_app.config.get('INVENTORY_API_TOKEN')
+        authorization = request.headers.get('Authorization', '')
+        if token and authorization.startswith('Bearer ') and \
+                hmac.compare_digest(authorization[len('Bearer '):].encode(), token.encode()):
+            return view(*args, **kwargs)
+        if not current_user.is_authenticated:
+            return jsonify({'error': 'Authentication required.'}), 401
+        if not current_user.is_admin:
+            return jsonify({'error': 'Admin access required.'}), 403
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def json_body_required(view):
+    # Requiring a JSON content type also keeps cross-site form posts out,
+    # since browsers cannot send one without a CORS preflight.
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if not request.is_json:
+            return jsonify({'error': 'Expected a JSON request body.'}), 415
+        return view(*args, **kwargs)
+    return wrapped
+
+
+def serialize_product(product):
+    data = product._asdict()
+    image_path = product.image_path or 'assets/images/product_images/Placeholder.jpg'
+    data['image_url'] = url_for('static', filename=image_path)
+    data['image_variants'] = [
+        {'url': url_for('static', filename=variant.path), 'format': variant.format,
+         'width': variant.width, 'height': variant.height}
+        for variant in product.image_variants
+    ]
+    return data
+
+
+def serialize_cart(summary):
+    return {
+        'lines': [line._asdict() for line in summary.lines],
+        'subtotal': summary.subtotal,
+        'loyalty_discount': summary.loyalty_discount,
+        'discount_amount': summary.discount_amount,
+        'total': summary.total,
+    }
+
+
+def catalog_response(selected_category='', search_query=''):
+    catalog = get_catalog()
+    if request.if_none_match.contains(catalog.etag):
+        response = jsonify()
+        response.status_code = 304
+        response.set_data(b'')
+    else:
+        products, categories = get_products_and_categories(selected_category, search_query, catalog=catalog)
+        page = paginate_list(products, *get_page_args(), ordered=not search_query)
+        response = jsonify({
+            'categories': categories,
+            'products': [serialize_product(product) for product in page.items],
+            'next_cursor': page.next_cursor,
+            'prev_cursor': page.prev_cursor,
+        })
+    response.set_etag(catalog.etag)
+    response.last_modified = catalog.last_modified
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@api_bp.route('/catalog', methods=['GET'])
+def catalog():
+    return catalog_response(request.args.get('category', ''), request.args.get('search', '').strip())
+
+
+@api_bp.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Query parameter q is required.'}), 400
+    return catalog_response(request.args.get('category', ''), query)
+
+
+@api_bp.route('/cart', methods=['GET'])
+@api_login_required
+def cart():
+    return jsonify(serialize_cart(get_cart_summary(current_user)))
+
+
+@api_bp.route('/cart/items', methods=['POST'])
+@api_login_required
+@json_body_required
+def add_cart_item():
+    data = request.get_json(silent=True) or {}
+    product_id = data.get('product_id')
+    quantity = data.get('quantity', 1)
+    if not isinstance(product_id, int) or not isinstance(quantity, int) or quantity <= 0:
+        return jsonify({'error': 'product_id and a positive integer quantity are required.'}), 400
+
+    try:
+        add_to_cart(current_user.user_id, product_id, quantity)
+    except CartError as e:
+        return jsonify({'error': str(e)}), 409
+    invalidate_catalog()
+    return jsonify(serialize_cart(get_cart_summary(current_user))), 201
+
+
+@api_bp.route('/cart/items/<int:product_id>', methods=['DELETE'])
+@api_login_required
+def remove_cart_item(product_id):
+    quantity = request.args.get('quantity', type=int)
+    if quantity is not None and quantity <= 0:
+        return jsonify({'error': 'quantity must be a positive integer.'}), 400
+
+    if not remove_from_cart(current_user.user_id, product_id, quantity):
+        return jsonify({'error': 'Item not found in cart.'}), 404
+    invalidate_catalog()
+    return jsonify(serialize_cart(get_cart_summary(current_user)))
+
+
+@api_bp.route('/checkout', methods=['POST'])
+@api_login_required
+@json_body_required
+def checkout():
+    try:
+        order_id = place_order(current_user)
+    except CheckoutError as e:
+        return jsonify({'error': str(e)}), 409
+    invalidate_user(current_user.user_id)
+    return jsonify({'order_id': order_id}), 201
+
+
+@api_bp.route('/inventory/stock', methods=['POST'])
+@inventory_auth_required
+@json_body_required
+def update_stock():
+    data = request.get_json(silent=True) or {}
+    try:
+        updated = apply_stock_updates(data.get('updates'))
+    except UnknownProductError as e:
+        return jsonify({'error': str(e), 'details': e.details}), 404
+    except StockConflictError as e:
+        return jsonify({'error': str(e), 'details': e.details}), 409
+    except StockUpdateError as e:
+        return jsonify({'error': str(e), 'details': e.details}), 400
+    invalidate_catalog()
+    return jsonify({'updated': updated})
@@ -3,12 +3,15 @@ from flask_login import login_user, logout_user, current_user, login_required
 from app import db
 from forms import LoginForm, RegistrationForm
 from app.models import User
-from datetime import datetime, timedelta
+from app.lockout import get_lockout_store
+from app.passwords import HashingBusyError
+from app.user_cache import invalidate_user
+from app.accounts import user_conflict_errors
+from sqlalchemy.exc import IntegrityError
+from datetime import datetime
 import re
 
 auth_bp = Blueprint('auth', __name__)
-locked_users = {}
-login_attempts = {}
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -17,13 +20,21 @@ def login():
         username = form.username.data
         password = form.password.data
 
+        if is_account_locked(username):
+            flash(f'Account locked. Try again in {get_lockout_duration(username) + 1} minutes.', 'error')
+            return redirect(url_for('auth.login'))
+
         user = User.query.filter_by(username=username).first()
 
-        if user is None or not user.check_password(password):
+        try:
+            password_ok = user is not None and user.check_password(password)
+        except HashingBusyError as e:
+            flash(str(e), 'error')
+            return redirect(url_for('auth.login'))
+
+        if not password_ok:
             flash('Invalid username or password.', 'error')
-            increment_failed_login_attempts(username)
-            
-            failed_attempts = get_failed_login_attempts(username)
+            failed_attempts = increment_failed_login_attempts(username)
             if failed_attempts >= 3:
                 lockout_duration = 5 if failed_attempts == 3 else 15 if failed_attempts == 4 else 60
                 lock_account(username, lockout_duration) 
@@ -32,7 +43,13 @@ def login():
             return redirect(url_for('auth.login'))
 
         reset_failed_login_attempts(username)
-        clear_lockout(username) 
+        if user.password_needs_rehash():
+            try:
+                user.set_password(password)
+                db.session.commit()
+                invalidate_user(user.user_id)
+            except HashingBusyError:
+                db.session.rollback()
         login_user(user)
         if user.is_admin:
             return redirect(url_for('admin.admin_dashboard'))
@@ -43,31 +60,24 @@ def login():
     return render_template('auth/login.html', form=form)
 
 def increment_failed_login_attempts(username):
-    login_attempts[username] = login_attempts.get(username, 0) + 1
-
-def get_failed_login_attempts(username):
-    return login_attempts.get(username, 0)
+    return get_lockout_store().register_failure(username)
 
 def reset_failed_login_attempts(username):
-    if username in login_attempts:
-        del login_attempts[username]
+    get_lockout_store().reset(username)
 
 def lock_account(username, duration_minutes):
-    locked_users[username] = datetime.now() + timedelta(minutes=duration_minutes)
+    get_lockout_store().lock(username, duration_minutes)
 
 def is_account_locked(username):
-    return username in locked_users and locked_users[username] > datetime.now()
+    return get_lockout_store().locked_until(username) is not None
 
 def get_lockout_duration(username):
-    if username in locked_users:
-        delta = locked_users[username] - datetime.now()
+    locked_until = get_lockout_store().locked_until(username)
+    if locked_until is not None:
+        delta = locked_until - datetime.now()
         return int(delta.total_seconds() / 60) 
     return 0
 
-def clear_lockout(username):
-    if username in locked_users:
-        del locked_users[username]
-
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
     form = RegistrationForm()
@@ -97,25 +107,24 @@ def register():
             if password != confirm_password:
                 errors.append('Passwords do not match.')
             
-            if User.query.filter_by(username=username).first():
-                errors.append('Username already taken. Please choose a different one.')
-
-            if User.query.filter_by(email=email).first():
-                errors.append('Email address already registered. Please use a different one.')
-
             if errors:
                 for error in errors:
                     flash(error, 'error')
                 return render_template('auth/register.html', form=form)
             
             user = User(username=username, email=email)
-            user.set_password(password)
             
             try:
+                user.set_password(password)
                 db.session.add(user)
                 db.session.commit()
                 flash('Registration successful. Please log in.')
                 return redirect(url_for('auth.login'))
+            except IntegrityError:
+                db.session.rollback()
+                for error in user_conflict_errors(username, email):
+                    flash(error, 'error')
+                return render_template('auth/register.html', form=form)
             except Exception as e:
                 db.session.rollback()
                 flash('Registration failed: ' + str(e), 'error')
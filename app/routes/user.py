@@ -1,10 +1,17 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
-from app.models import User, Product, Cart, Order, OrderItem
 from forms import BalanceForm, CartForm, UpdateAccountForm
 from app import db
-from datetime import timedelta
-from app.helpers import get_products_and_categories
+from app.helpers import get_product_grid
+from app.catalog import invalidate_catalog
+from app.cart import CartError, get_cart_summary, add_to_cart as add_to_cart_item, remove_from_cart
+from app.checkout import CheckoutError, place_order
+from app.user_cache import invalidate_user
+from app.orders import get_order_history
+from app.pagination import get_page_args
+from app.money import to_money
+from app.ledger import top_up
+from app.passwords import HashingBusyError
 
 user_bp = Blueprint('user', __name__)
 
@@ -13,9 +20,9 @@ def shop():
     selected_category = request.args.get('category', '')
     search_query = request.args.get('search', '')
     
-    products, categories = get_products_and_categories(selected_category, search_query)
+    product_grid, page, categories = get_product_grid(selected_category, search_query)
     form = CartForm()
-    return render_template('shared/index.html', products=products, form=form, categories=categories, selected_category=selected_category)
+    return render_template('shared/index.html', product_grid=product_grid, page=page, form=form, categories=categories, selected_category=selected_category)
 
 @user_bp.route('/balance', methods=['GET', 'POST'])
 @login_required
@@ -24,12 +31,12 @@ def balance():
     error = None
     if form.validate_on_submit():
         try:
-            amount = float(form.amount.data)
+            amount = to_money(form.amount.data)
             if amount <= 0:
                 error = "Amount must be positive."
             else:
-                current_user.balance += amount
-                db.session.commit()
+                top_up(current_user.user_id, amount)
+                invalidate_user(current_user.user_id)
                 flash('Balance updated successfully!', 'success')
                 return redirect(url_for('user.balance'))
         except ValueError:
@@ -42,9 +49,8 @@ def balance():
 @login_required
 def cart():
     form = CartForm()
-    cart_items = Cart.query.filter_by(user_id=current_user.user_id).all()
-    total = sum(item.product.price * item.quantity for item in cart_items)
-    return render_template('users/cart.html', cart_items=cart_items, total=total, form=form)
+    summary = get_cart_summary(current_user)
+    return render_template('users/cart.html', summary=summary, form=form)
 
 
 @user_bp.route('/add_to_cart', methods=['GET'])
@@ -56,54 +62,32 @@ def add_to_cart():
     product_id = request.args.get('product_id', type=int)
     quantity = request.args.get('quantity', type=int, default=1)
 
-    if not product_id or not quantity:
+    if not product_id or not quantity or quantity < 0:
         flash('Invalid input.', 'danger')
         return redirect(url_for('user.shop'))
 
-    product = Product.query.get(product_id)
-    if product and product.quantity >= quantity:
-        cart_item = Cart.query.filter_by(user_id=current_user.user_id, product_id=product.id).first()
-        if cart_item:
-            cart_item.quantity += quantity
-        else:
-            cart_item = Cart(user_id=current_user.user_id, product_id=product.id, quantity=quantity)
-            db.session.add(cart_item)
-        product.quantity -= quantity
-        db.session.commit()
+    try:
+        add_to_cart_item(current_user.user_id, product_id, quantity)
+        invalidate_catalog()
         flash('Item added to cart.')
-    else:
-        flash('Item not available in the requested quantity.')
+    except CartError as e:
+        flash(str(e))
+    except Exception as e:
+        flash(f'An error occurred while adding the item to the cart: {str(e)}', 'danger')
     
     return redirect(url_for('user.shop'))
 
 @user_bp.route('/checkout', methods=['POST'])
 @login_required
 def checkout():
-    cart_items = Cart.query.filter_by(user_id=current_user.user_id).all()
-
-    if not cart_items:
-        flash('Your cart is empty. Add items to your cart before checking out.', 'warning')
-        return redirect(url_for('user.cart'))
-
-    total = sum(item.product.price * item.quantity for item in cart_items)
-
-    if current_user.is_eligible_for_discount():
-        discount = 0.15
-        total *= (1 - discount)
-
-    if current_user.balance >= total:
-        new_order = Order(user_id=current_user.user_id, total=total)
-        db.session.add(new_order)
-        db.session.commit()
-        for item in cart_items:
-            order_item = OrderItem(order_id=new_order.order_id, product_id=item.product_id, quantity=item.quantity, price=item.product.get_discounted_price())
-            db.session.add(order_item)
-            db.session.delete(item)
-        current_user.balance -= total
-        db.session.commit()
+    try:
+        place_order(current_user)
+        invalidate_user(current_user.user_id)
         flash('Purchase successful.')
-    else:
-        flash('Insufficient balance.')
+    except CheckoutError as e:
+        flash(str(e), 'warning')
+    except Exception as e:
+        flash(f'An error occurred during checkout: {str(e)}', 'danger')
 
     return redirect(url_for('user.cart'))
 
@@ -113,13 +97,18 @@ def checkout():
 def account():
     form = UpdateAccountForm()
     if form.validate_on_submit():
-        current_user.username = form.username.data
-        current_user.email = form.email.data
-        if form.password.data:
-            current_user.set_password(form.password.data)
-        db.session.commit()
-        flash('Your account has been updated!', 'success')
-        return redirect(url_for('user.account'))
+        try:
+            current_user.username = form.username.data
+            current_user.email = form.email.data
+            if form.password.data:
+                current_user.set_password(form.password.data)
+            db.session.commit()
+            invalidate_user(current_user.user_id)
+            flash('Your account has been updated!', 'success')
+            return redirect(url_for('user.account'))
+        except HashingBusyError as e:
+            db.session.rollback()
+            flash(str(e), 'danger')
     elif request.method == 'GET':
         form.username.data = current_user.username
         form.email.data = current_user.email
@@ -128,35 +117,28 @@ def account():
 @user_bp.route('/orders_history', methods=['GET'])
 @login_required
 def order_history():
-    orders = Order.query.filter_by(user_id=current_user.user_id).all()
-    for order in orders:
-        order.order_date += timedelta(hours=3)
-    return render_template('users/orders_history.html', orders=orders)
+    page = get_order_history(current_user.user_id, *get_page_args())
+    return render_template('users/orders_history.html', orders=page.items, page=page)
 
 
 
 
 @user_bp.route('/search', methods=['GET'])
 def search():
-    query = request.args.get('query', '').strip().lower()
+    query = request.args.get('query', '').strip()
     if query:
-        results = Product.query.filter(Product.name.ilike(f'%{query}%')).all()
+        product_grid, page, categories = get_product_grid(search_query=query)
     else:
-        results = []
+        product_grid, page, categories = '', None, []
     form = CartForm()
-    return render_template('shared/index.html', products=results, form=form)
+    return render_template('shared/index.html', product_grid=product_grid, page=page, form=form, categories=categories)
 
 
 @user_bp.route('/remove_one_from_cart/<int:item_id>', methods=['POST'])
 @login_required
 def remove_one_from_cart(item_id):
-    cart_item = Cart.query.filter_by(user_id=current_user.user_id, product_id=item_id).first()
-    if cart_item:
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-        else:
-            db.session.delete(cart_item)
-        db.session.commit()
+    if remove_from_cart(current_user.user_id, item_id, 1):
+        invalidate_catalog()
         flash('One item removed from cart.', 'success')
     else:
         flash('Item not found in cart.', 'danger')
@@ -165,10 +147,8 @@ def remove_one_from_cart(item_id):
 @user_bp.route('/remove_all_from_cart/<int:item_id>', methods=['POST'])
 @login_required
 def remove_all_from_cart(item_id):
-    cart_item = Cart.query.filter_by(user_id=current_user.user_id, product_id=item_id).first()
-    if cart_item:
-        db.session.delete(cart_item)
-        db.session.commit()
+    if remove_from_cart(current_user.user_id, item_id):
+        invalidate_catalog()
         flash('All items removed from cart.', 'success')
     else:
         flash('Item not found in cart.', 'danger')
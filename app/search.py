@@ -0,0 +1,62 @@
+import bisect
+import re
+
+_TOKEN_RE = re.compile(r'\w+')
+
+FIELD_WEIGHTS = (('name', 3.0), ('category', 2.0), ('description', 1.0))
+EXACT_MATCH_BONUS = 2.0
+
+
+def tokenize(text):
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class SearchIndex:
+    # Inverted index over catalog products. Terms are kept sorted so a query
+    # token is matched as a prefix with a bisect instead of scanning products.
+
+    def __init__(self, products):
+        self._products = {product.id: product for product in products}
+        postings = {}
+        for product in products:
+            for field, weight in FIELD_WEIGHTS:
+                # Weight is spread over the field's tokens, so "Apple" ranks
+                # above "Apple Juice" for "apple".
+                tokens = tokenize(getattr(product, field))
+                for token in tokens:
+                    entry = postings.setdefault(token, {})
+                    entry[product.id] = entry.get(product.id, 0.0) + weight / len(tokens)
+        self._postings = postings
+        self._terms = sorted(postings)
+
+    def _match_prefix(self, prefix):
+        scores = {}
+        index = bisect.bisect_left(self._terms, prefix)
+        while index < len(self._terms) and self._terms[index].startswith(prefix):
+            term = self._terms[index]
+            bonus = EXACT_MATCH_BONUS if term == prefix else 1.0
+            for product_id, weight in self._postings[term].items():
+                scores[product_id] = scores.get(product_id, 0.0) + weight * bonus
+            index += 1
+        return scores
+
+    def search(self, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        scores = None
+        for token in tokens:
+            matches = self._match_prefix(token)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {product_id: score + matches[product_id]
+                          for product_id, score in scores.items() if product_id in matches}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._products[item[0]].name))
+        return [self._products[product_id] for product_id, _ in ranked]
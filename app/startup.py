@@ -0,0 +1,31 @@
+import time
+
+
+class StartupTimer:
+    # Records how long each phase of create_app took, so slow worker boots
+    # can be traced to imports, extensions, blueprints or templates.
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases = []
+
+    def add(self, phase, seconds):
+        self.phases.append((phase, seconds))
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def as_dict(self):
+        return {
+            'phases_ms': {phase: round(seconds * 1000, 1) for phase, seconds in self.phases},
+            'total_ms': round(self.total * 1000, 1),
+        }
+
+    def summary(self):
+        return ', '.join(f'{phase} {seconds * 1000:.0f}ms' for phase, seconds in self.phases)
@@ -0,0 +1,45 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from app import db
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+
+
+def load_user(user_id):
+    # Caches the User row's column values for USER_CACHE_TTL seconds and
+    # re-attaches a copy to the request's session without a SELECT, so
+    # current_user stays a normal, updatable ORM object.
+    from app.models import User
+
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None and entry[0] <= now:
+            del _entries[user_id]
+            entry = None
+
+    if entry is not None:
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    user = db.session.get(User, user_id)
+    ttl = current_app.config['USER_CACHE_TTL']
+    if user is not None and ttl > 0:
+        values = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        with _lock:
+            _entries[user_id] = (now + ttl, values)
+            _entries.move_to_end(user_id)
+            while len(_entries) > current_app.config['USER_CACHE_MAX_ENTRIES']:
+                _entries.popitem(last=False)
+    return user
+
+
+def invalidate_user(user_id):
+    with _lock:
+        _entries.pop(user_id, None)
@@ -1,9 +1,74 @@
 import os
+from dotenv import load_dotenv
 
 basedir = os.path.abspath(os.path.dirname(__file__))
+# Loaded here rather than in create_app so the class attributes below see .env values
+load_dotenv(os.path.join(basedir, '.env'))
+
+
+def normalize_database_url(url):
+    # Heroku-style URLs use a scheme SQLAlchemy no longer accepts
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def database_url():
+    return normalize_database_url(
+        os.environ.get('DATABASE_URL', f'sqlite:///{os.path.join(basedir, "database.db")}'))
+
+
+def replica_urls():
+    return [normalize_database_url(url.strip())
+            for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+
+
+def engine_options(url):
+    if url.startswith('sqlite'):
+        # SQLite tuning is applied per connection in app.database
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+
 
 class Config:
     SECRET_KEY = 'your_secret_key_here'
-    SQLALCHEMY_DATABASE_URI = f'sqlite:///{os.path.join(basedir, "database.db")}'
+    SQLALCHEMY_DATABASE_URI = database_url()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+    # Read replicas are registered as binds named replica0, replica1, ...
+    SQLALCHEMY_BINDS = {f'replica{index}': dict(engine_options(url), url=url)
+                        for index, url in enumerate(replica_urls())}
+    REPLICA_LAG_SECONDS = 5
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
     WTF_CSRF_ENABLED = True
+    CATALOG_CACHE_TTL = 60
+    FRAGMENT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    PER_PAGE = 24
+    MAX_PER_PAGE = 100
+    LOCKOUT_BACKEND = os.environ.get('LOCKOUT_BACKEND', 'sql')
+    LOCKOUT_WINDOW_SECONDS = 3600
+    LOCKOUT_MAX_ENTRIES = 10000
+    USER_CACHE_TTL = 10
+    USER_CACHE_MAX_ENTRIES = 10000
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = 32
+    PASSWORD_HASH_TIMEOUT = 10
+    DISPLAY_TIMEZONE = 'Europe/Vilnius'
+    IMAGE_VARIANT_WIDTHS = (200, 400, 800)
+    IMAGE_WORKERS = 1
+    MAX_IMAGE_UPLOAD_BYTES = 20 * 1024 * 1024
+    MAX_CONTENT_LENGTH = 64 * 1024 * 1024
+    BULK_IMPORT_BATCH_SIZE = 500
+    INVENTORY_API_TOKEN = os.environ.get('INVENTORY_API_TOKEN')
+    # Web workers can set LAZY_STARTUP=1; migrations must then run without it
+    LAZY_STARTUP = os.environ.get('LAZY_STARTUP') == '1'
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR', os.path.join(basedir, 'instance', 'jinja_cache'))
@@ -7,7 +7,10 @@ cd /home/site/wwwroot
 flask db upgrade
 
 # Initialize admin user
-python -c "from app import init_admin_user; init_admin_user()"
+flask init-admin
 
-# Start the application
-flask run --host=0.0.0.0 --port=8000
+# Precompile templates so workers load them from the bytecode cache
+flask compile-templates
+
+# Start the application; workers skip migration tooling at startup
+LAZY_STARTUP=1 flask run --host=0.0.0.0 --port=8000
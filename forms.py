@@ -1,7 +1,10 @@
 from flask_wtf import FlaskForm
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, FloatField, IntegerField, TextAreaField, SelectField, DecimalField
+from wtforms.widgets import HiddenInput
 from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, NumberRange, Optional
 from app.models import User, Product 
+from app.accounts import find_user_conflicts
 from app import db
 import re
 
@@ -9,6 +12,9 @@ class UserForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     email = StringField('Email', validators=[DataRequired(), Email()])
     balance = DecimalField('Balance', validators=[Optional(), NumberRange(min=0, message="Balance must be 0 or more")])
+    # Balance shown when the edit form was loaded; the update only applies
+    # if it is still current.
+    expected_balance = DecimalField(widget=HiddenInput(), validators=[Optional()])
     is_admin = BooleanField('Is Admin')
     password = PasswordField('Password')
     confirm = PasswordField('Repeat Password', validators=[EqualTo('password', message="Passwords must match")])
@@ -37,15 +43,16 @@ class RegistrationForm(FlaskForm):
     confirm = PasswordField('Repeat Password', validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Register')
 
-    def validate_username(self, username):
-        user = User.query.filter_by(username=username.data).first()
-        if user is not None:
-            raise ValidationError('Please use a different username.')
+    def validate(self, extra_validators=None):
+        # Username and email uniqueness are checked together in one query
+        valid = super().validate(extra_validators)
+        if self.username.data and self.email.data:
+            for field, message in find_user_conflicts(self.username.data, self.email.data).items():
+                getattr(self, field).errors.append(message)
+                valid = False
+        return valid
 
     def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user is not None:
-            raise ValidationError('Email already in use. Please use a different email address.')
         if not re.match(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$', email.data):
             raise ValidationError('Invalid email format. Must be in the format name@domain.com.')
 
@@ -71,7 +78,7 @@ class CartForm(FlaskForm):
 
 class ProductForm(FlaskForm):
     name = StringField('Product Name', validators=[DataRequired()])
-    price = FloatField('Price', validators=[DataRequired()])
+    price = DecimalField('Price', places=2, validators=[DataRequired()])
     quantity = IntegerField('Quantity', validators=[DataRequired()])
     description = TextAreaField('Description')
     category = StringField('Category', validators=[DataRequired()])
@@ -85,6 +92,14 @@ class ProductForm(FlaskForm):
         if field.data < 0:
             raise ValidationError('Quantity must be non-negative.')
 
+class ProductImageForm(FlaskForm):
+    image = FileField('Product Image', validators=[FileRequired(), FileAllowed(['jpg', 'jpeg', 'png', 'webp'], 'Images only.')])
+    submit = SubmitField('Upload Image')
+
+class ProductImportForm(FlaskForm):
+    file = FileField('Product File', validators=[FileRequired(), FileAllowed(['csv', 'jsonl', 'ndjson'], 'CSV or JSONL files only.')])
+    submit = SubmitField('Import Products')
+
 class DiscountForm(FlaskForm):
     product_id = SelectField('Product', choices=[], coerce=int, validators=[DataRequired()])
     discount_percentage = FloatField('Discount Percentage', validators=[DataRequired(), NumberRange(min=0, max=100)])
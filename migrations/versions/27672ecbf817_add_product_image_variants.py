@@ -0,0 +1,38 @@
+"""Add ProductImageVariants table for resized product images
+
+Revision ID: 27672ecbf817
+Revises: 8cfd54ffc615
+Create Date: 2026-10-18 13:41:05.227164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '27672ecbf817'
+down_revision = '8cfd54ffc615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ProductImageVariants',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('format', sa.String(length=10), nullable=False),
+    sa.Column('width', sa.Integer(), nullable=False),
+    sa.Column('height', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['Products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ProductImageVariants', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ProductImageVariants_product_id'), ['product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ProductImageVariants', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ProductImageVariants_product_id'))
+
+    op.drop_table('ProductImageVariants')
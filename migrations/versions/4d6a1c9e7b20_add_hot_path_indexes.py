@@ -0,0 +1,75 @@
+"""Add indexes for cart, order history, discount and category lookups
+
+Revision ID: 4d6a1c9e7b20
+Revises: 27672ecbf817
+Create Date: 2026-10-18 14:21:03.512877
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d6a1c9e7b20'
+down_revision = '27672ecbf817'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The unique indexes below would fail on existing duplicates: merge cart
+    # lines for the same user and product, and keep the largest discount per
+    # product (the one pricing already applied).
+    op.execute("""
+        UPDATE "Cart" SET quantity = (
+            SELECT SUM(c2.quantity) FROM "Cart" c2
+            WHERE c2.user_id = "Cart".user_id AND c2.product_id = "Cart".product_id
+        )
+        WHERE cart_id IN (SELECT MIN(cart_id) FROM "Cart" GROUP BY user_id, product_id HAVING COUNT(*) > 1)
+    """)
+    op.execute("""
+        DELETE FROM "Cart"
+        WHERE cart_id NOT IN (SELECT MIN(cart_id) FROM "Cart" GROUP BY user_id, product_id)
+    """)
+    op.execute("""
+        DELETE FROM "Discounts"
+        WHERE id NOT IN (
+            SELECT MIN(d.id) FROM "Discounts" d
+            WHERE d.discount_percentage = (
+                SELECT MAX(d2.discount_percentage) FROM "Discounts" d2 WHERE d2.product_id = d.product_id
+            )
+            GROUP BY d.product_id
+        )
+    """)
+
+    with op.batch_alter_table('Cart', schema=None) as batch_op:
+        batch_op.create_index('ix_Cart_user_id_product_id', ['user_id', 'product_id'], unique=True)
+
+    with op.batch_alter_table('Discounts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_Discounts_product_id'), ['product_id'], unique=True)
+
+    with op.batch_alter_table('OrderItems', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_OrderItems_order_id'), ['order_id'], unique=False)
+
+    with op.batch_alter_table('Orders', schema=None) as batch_op:
+        batch_op.create_index('ix_Orders_user_id_order_date', ['user_id', 'order_date'], unique=False)
+
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_Products_category'), ['category'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('Products', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Products_category'))
+
+    with op.batch_alter_table('Orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_Orders_user_id_order_date')
+
+    with op.batch_alter_table('OrderItems', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_OrderItems_order_id'))
+
+    with op.batch_alter_table('Discounts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_Discounts_product_id'))
+
+    with op.batch_alter_table('Cart', schema=None) as batch_op:
+        batch_op.drop_index('ix_Cart_user_id_product_id')
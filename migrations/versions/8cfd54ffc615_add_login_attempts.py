@@ -0,0 +1,35 @@
+"""Add LoginAttempts table for shared login lockout
+
+Revision ID: 8cfd54ffc615
+Revises: a8fba6cef2fe
+Create Date: 2026-10-18 10:02:17.904615
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8cfd54ffc615'
+down_revision = 'a8fba6cef2fe'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('LoginAttempts',
+    sa.Column('username', sa.String(), nullable=False),
+    sa.Column('failed_attempts', sa.Integer(), nullable=False),
+    sa.Column('last_failure_at', sa.DateTime(), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('username')
+    )
+    with op.batch_alter_table('LoginAttempts', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_LoginAttempts_last_failure_at'), ['last_failure_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('LoginAttempts', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_LoginAttempts_last_failure_at'))
+
+    op.drop_table('LoginAttempts')
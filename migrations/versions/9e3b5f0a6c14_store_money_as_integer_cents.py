@@ -0,0 +1,41 @@
+"""Store money columns as 64-bit integer cents
+
+Revision ID: 9e3b5f0a6c14
+Revises: 4d6a1c9e7b20
+Create Date: 2026-10-18 15:02:47.118392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e3b5f0a6c14'
+down_revision = '4d6a1c9e7b20'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = (
+    ('Users', 'balance', True),
+    ('Users', 'total_spent', False),
+    ('Products', 'price', False),
+    ('Orders', 'total', False),
+    ('OrderItems', 'price', False),
+    ('Transactions', 'amount', False),
+)
+
+
+def upgrade():
+    for table, column, nullable in MONEY_COLUMNS:
+        op.execute(f'UPDATE "{table}" SET "{column}" = ROUND("{column}" * 100) WHERE "{column}" IS NOT NULL')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.Float(), type_=sa.BigInteger(),
+                                  existing_nullable=nullable, postgresql_using=f'"{column}"::bigint')
+
+
+def downgrade():
+    for table, column, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Float(),
+                                  existing_nullable=nullable)
+        op.execute(f'UPDATE "{table}" SET "{column}" = "{column}" / 100.0 WHERE "{column}" IS NOT NULL')
@@ -0,0 +1,35 @@
+"""Add order count and lifetime spend to Users
+
+Revision ID: a8fba6cef2fe
+Revises: bf84e241b907
+Create Date: 2026-10-18 09:12:41.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8fba6cef2fe'
+down_revision = 'bf84e241b907'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('order_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('total_spent', sa.Float(), nullable=False, server_default='0'))
+
+    # Backfill from existing orders
+    op.execute("""
+        UPDATE "Users" SET
+            order_count = (SELECT COUNT(*) FROM "Orders" WHERE "Orders".user_id = "Users".user_id),
+            total_spent = (SELECT COALESCE(SUM(total), 0) FROM "Orders" WHERE "Orders".user_id = "Users".user_id)
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('Users', schema=None) as batch_op:
+        batch_op.drop_column('total_spent')
+        batch_op.drop_column('order_count')
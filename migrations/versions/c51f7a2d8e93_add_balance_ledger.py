@@ -0,0 +1,47 @@
+"""Turn Transactions into the balance ledger
+
+Revision ID: c51f7a2d8e93
+Revises: 9e3b5f0a6c14
+Create Date: 2026-10-18 15:47:30.284116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c51f7a2d8e93'
+down_revision = '9e3b5f0a6c14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('Transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('kind', sa.String(length=20), nullable=False, server_default='topup'))
+        batch_op.add_column(sa.Column('order_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_Transactions_order_id_Orders', 'Orders', ['order_id'], ['order_id'])
+        batch_op.create_index(batch_op.f('ix_Transactions_order_id'), ['order_id'], unique=False)
+        batch_op.create_index('ix_Transactions_user_id_transaction_id', ['user_id', 'transaction_id'], unique=False)
+
+    # Open every account with whatever part of its balance the ledger does
+    # not explain yet, so `flask verify-balances` starts out clean.
+    op.execute("""
+        INSERT INTO "Transactions" (user_id, amount, kind)
+        SELECT u.user_id,
+               COALESCE(u.balance, 0) - COALESCE((SELECT SUM(t.amount) FROM "Transactions" t
+                                                  WHERE t.user_id = u.user_id), 0),
+               'opening'
+        FROM "Users" u
+        WHERE COALESCE(u.balance, 0) != COALESCE((SELECT SUM(t.amount) FROM "Transactions" t
+                                                   WHERE t.user_id = u.user_id), 0)
+    """)
+
+
+def downgrade():
+    op.execute("""DELETE FROM "Transactions" WHERE kind = 'opening'""")
+    with op.batch_alter_table('Transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_Transactions_user_id_transaction_id')
+        batch_op.drop_index(batch_op.f('ix_Transactions_order_id'))
+        batch_op.drop_column('order_id')
+        batch_op.drop_column('kind')